@@ -5,39 +5,266 @@ d = { 'settings': { 'branch': 'main',
                 'doc_host': 'https://jochym.github.io',
                 'git_url': 'https://github.com/jochym/ouscope/',
                 'lib_path': 'ouscope'},
-  'syms': { 'ouscope.core': { 'ouscope.core.Telescope': ('core.html#telescope', 'ouscope/core.py'),
+  'syms': { 'ouscope.bench': { 'ouscope.bench._ZeroCoord': ('bench.html#_zerocoord', 'ouscope/bench.py'),
+                               'ouscope.bench._ZeroCoord._Angle': ('bench.html#_zerocoord._angle', 'ouscope/bench.py'),
+                               'ouscope.bench.bench_client': ('bench.html#bench_client', 'ouscope/bench.py'),
+                               'ouscope.bench.import_time': ('bench.html#import_time', 'ouscope/bench.py'),
+                               'ouscope.bench.ouscope_bench': ('bench.html#ouscope_bench', 'ouscope/bench.py')},
+            'ouscope.cache': { 'ouscope.cache.ObsCache': ('cache.html#obscache', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.__init__': ('cache.html#obscache.__init__', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.evict': ('cache.html#obscache.evict', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.get': ('cache.html#obscache.get', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.migrate': ('cache.html#obscache.migrate', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.path': ('cache.html#obscache.path', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.put': ('cache.html#obscache.put', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.remove': ('cache.html#obscache.remove', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.total': ('cache.html#obscache.total', 'ouscope/cache.py'),
+                               'ouscope.cache.ObsCache.verify': ('cache.html#obscache.verify', 'ouscope/cache.py'),
+                               'ouscope.cache.file_checksum': ('cache.html#file_checksum', 'ouscope/cache.py'),
+                               'ouscope.cache.migrate_cache': ('cache.html#migrate_cache', 'ouscope/cache.py'),
+                               'ouscope.cache.parse_size': ('cache.html#parse_size', 'ouscope/cache.py')},
+            'ouscope.catalog': { 'ouscope.catalog.Catalog': ('catalog.html#catalog', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.__init__': ('catalog.html#catalog.__init__', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.add_job': ('catalog.html#catalog.add_job', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.add_requests': ('catalog.html#catalog.add_requests', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.job_requests': ('catalog.html#catalog.job_requests', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.jobs_between': ('catalog.html#catalog.jobs_between', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.link': ('catalog.html#catalog.link', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.missing_jobs': ('catalog.html#catalog.missing_jobs', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.object_jobs': ('catalog.html#catalog.object_jobs', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.query': ('catalog.html#catalog.query', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.sync_state': ('catalog.html#catalog.sync_state', 'ouscope/catalog.py'),
+                                 'ouscope.catalog.Catalog.unlinked_requests': ( 'catalog.html#catalog.unlinked_requests',
+                                                                                'ouscope/catalog.py'),
+                                 'ouscope.catalog.Telescope.sync_catalog': ('catalog.html#telescope.sync_catalog', 'ouscope/catalog.py')},
+            'ouscope.core': { 'ouscope.core.BulkMapError': ('core.html#bulkmaperror', 'ouscope/core.py'),
+                              'ouscope.core.BulkMapError.__init__': ('core.html#bulkmaperror.__init__', 'ouscope/core.py'),
+                              'ouscope.core.FieldTable': ('core.html#fieldtable', 'ouscope/core.py'),
+                              'ouscope.core.FieldTable.__init__': ('core.html#fieldtable.__init__', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics': ('core.html#httpmetrics', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.__init__': ('core.html#httpmetrics.__init__', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics._entry': ('core.html#httpmetrics._entry', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.dump': ('core.html#httpmetrics.dump', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.received': ('core.html#httpmetrics.received', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.record': ('core.html#httpmetrics.record', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.reset': ('core.html#httpmetrics.reset', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.retry': ('core.html#httpmetrics.retry', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.snapshot': ('core.html#httpmetrics.snapshot', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.start_dump': ('core.html#httpmetrics.start_dump', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.stop_dump': ('core.html#httpmetrics.stop_dump', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.summary': ('core.html#httpmetrics.summary', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.to_json': ('core.html#httpmetrics.to_json', 'ouscope/core.py'),
+                              'ouscope.core.HttpMetrics.to_prometheus': ('core.html#httpmetrics.to_prometheus', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache': ('core.html#metacache', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache.__init__': ('core.html#metacache.__init__', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache.get': ('core.html#metacache.get', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache.invalidate': ('core.html#metacache.invalidate', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache.set': ('core.html#metacache.set', 'ouscope/core.py'),
+                              'ouscope.core.MetaCache.stats': ('core.html#metacache.stats', 'ouscope/core.py'),
+                              'ouscope.core.MeteredAdapter': ('core.html#meteredadapter', 'ouscope/core.py'),
+                              'ouscope.core.MeteredAdapter.__init__': ('core.html#meteredadapter.__init__', 'ouscope/core.py'),
+                              'ouscope.core.MeteredAdapter.send': ('core.html#meteredadapter.send', 'ouscope/core.py'),
+                              'ouscope.core.RateLimit': ('core.html#ratelimit', 'ouscope/core.py'),
+                              'ouscope.core.RateLimit.__init__': ('core.html#ratelimit.__init__', 'ouscope/core.py'),
+                              'ouscope.core.RateLimit.wait': ('core.html#ratelimit.wait', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler': ('core.html#readyscheduler', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler.__init__': ('core.html#readyscheduler.__init__', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler.__len__': ('core.html#readyscheduler.__len__', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler._check': ('core.html#readyscheduler._check', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler._loop': ('core.html#readyscheduler._loop', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler._push': ('core.html#readyscheduler._push', 'ouscope/core.py'),
+                              'ouscope.core.ReadyScheduler.submit': ('core.html#readyscheduler.submit', 'ouscope/core.py'),
+                              'ouscope.core.Telescope': ('core.html#telescope', 'ouscope/core.py'),
                               'ouscope.core.Telescope.__do_api_call': ('core.html#telescope.__do_api_call', 'ouscope/core.py'),
                               'ouscope.core.Telescope.__do_rc_api': ('core.html#telescope.__do_rc_api', 'ouscope/core.py'),
                               'ouscope.core.Telescope.__do_rm_api': ('core.html#telescope.__do_rm_api', 'ouscope/core.py'),
                               'ouscope.core.Telescope.__init__': ('core.html#telescope.__init__', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._job_search': ('core.html#telescope._job_search', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._login_session': ('core.html#telescope._login_session', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._meta_refresh': ('core.html#telescope._meta_refresh', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._new_session': ('core.html#telescope._new_session', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._obs_window': ('core.html#telescope._obs_window', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._processed_rq': ('core.html#telescope._processed_rq', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._processed_src': ('core.html#telescope._processed_src', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._rc_params': ('core.html#telescope._rc_params', 'ouscope/core.py'),
+                              'ouscope.core.Telescope._rc_submit': ('core.html#telescope._rc_submit', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.cache_stats': ('core.html#telescope.cache_stats', 'ouscope/core.py'),
                               'ouscope.core.Telescope.download_obs': ('core.html#telescope.download_obs', 'ouscope/core.py'),
                               'ouscope.core.Telescope.download_obs_processed': ( 'core.html#telescope.download_obs_processed',
                                                                                  'ouscope/core.py'),
                               'ouscope.core.Telescope.get_jid_for_req': ('core.html#telescope.get_jid_for_req', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_job': ('core.html#telescope.get_job', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.get_jobs': ('core.html#telescope.get_jobs', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.get_layers': ('core.html#telescope.get_layers', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_obs': ('core.html#telescope.get_obs', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_obs_list': ('core.html#telescope.get_obs_list', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_obs_processed': ('core.html#telescope.get_obs_processed', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.get_obs_range': ('core.html#telescope.get_obs_range', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_request': ('core.html#telescope.get_request', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.get_requests': ('core.html#telescope.get_requests', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_user_folders': ('core.html#telescope.get_user_folders', 'ouscope/core.py'),
                               'ouscope.core.Telescope.get_user_requests': ('core.html#telescope.get_user_requests', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.ie_create': ('core.html#telescope.ie_create', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.ie_ready': ('core.html#telescope.ie_ready', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.ie_status': ('core.html#telescope.ie_status', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.is_final': ('core.html#telescope.is_final', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.iter_user_requests': ('core.html#telescope.iter_user_requests', 'ouscope/core.py'),
                               'ouscope.core.Telescope.login': ('core.html#telescope.login', 'ouscope/core.py'),
                               'ouscope.core.Telescope.logout': ('core.html#telescope.logout', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.open_requests': ('core.html#telescope.open_requests', 'ouscope/core.py'),
                               'ouscope.core.Telescope.submit_RADEC_job': ('core.html#telescope.submit_radec_job', 'ouscope/core.py'),
+                              'ouscope.core.Telescope.submit_batch': ('core.html#telescope.submit_batch', 'ouscope/core.py'),
                               'ouscope.core.Telescope.submit_job_api': ('core.html#telescope.submit_job_api', 'ouscope/core.py'),
-                              'ouscope.core.cleanup': ('core.html#cleanup', 'ouscope/core.py')},
-            'ouscope.process': { 'ouscope.process.analyse_job': ('process.html#analyse_job', 'ouscope/process.py'),
+                              'ouscope.core.Telescope.sync_user_requests': ('core.html#telescope.sync_user_requests', 'ouscope/core.py'),
+                              'ouscope.core._timestamp': ('core.html#_timestamp', 'ouscope/core.py'),
+                              'ouscope.core._transient': ('core.html#_transient', 'ouscope/core.py'),
+                              'ouscope.core.bulk_map': ('core.html#bulk_map', 'ouscope/core.py'),
+                              'ouscope.core.cleanup': ('core.html#cleanup', 'ouscope/core.py'),
+                              'ouscope.core.endpoint_name': ('core.html#endpoint_name', 'ouscope/core.py'),
+                              'ouscope.core.parse_epoch': ('core.html#parse_epoch', 'ouscope/core.py'),
+                              'ouscope.core.parse_fields': ('core.html#parse_fields', 'ouscope/core.py'),
+                              'ouscope.core.parse_jid': ('core.html#parse_jid', 'ouscope/core.py'),
+                              'ouscope.core.parse_jid_list': ('core.html#parse_jid_list', 'ouscope/core.py'),
+                              'ouscope.core.parse_job': ('core.html#parse_job', 'ouscope/core.py'),
+                              'ouscope.core.parse_request': ('core.html#parse_request', 'ouscope/core.py')},
+            'ouscope.download': { 'ouscope.download.DownloadManager': ('download.html#downloadmanager', 'ouscope/download.py'),
+                                  'ouscope.download.DownloadManager.__init__': ( 'download.html#downloadmanager.__init__',
+                                                                                 'ouscope/download.py'),
+                                  'ouscope.download.DownloadManager._download': ( 'download.html#downloadmanager._download',
+                                                                                  'ouscope/download.py'),
+                                  'ouscope.download.DownloadManager._prepare': ( 'download.html#downloadmanager._prepare',
+                                                                                 'ouscope/download.py'),
+                                  'ouscope.download.DownloadManager.add': ('download.html#downloadmanager.add', 'ouscope/download.py'),
+                                  'ouscope.download.DownloadManager.run': ('download.html#downloadmanager.run', 'ouscope/download.py'),
+                                  'ouscope.download.Telescope.download_many': ( 'download.html#telescope.download_many',
+                                                                                'ouscope/download.py'),
+                                  'ouscope.download.fetch': ('download.html#fetch', 'ouscope/download.py')},
+            'ouscope.fakeserver': { 'ouscope.fakeserver.FakeTelescope': ('fakeserver.html#faketelescope', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.__enter__': ( 'fakeserver.html#faketelescope.__enter__',
+                                                                                    'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.__exit__': ( 'fakeserver.html#faketelescope.__exit__',
+                                                                                   'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.__init__': ( 'fakeserver.html#faketelescope.__init__',
+                                                                                   'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope._ie_status': ( 'fakeserver.html#faketelescope._ie_status',
+                                                                                     'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope._load_templates': ( 'fakeserver.html#faketelescope._load_templates',
+                                                                                          'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.api': ('fakeserver.html#faketelescope.api', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.jids': ( 'fakeserver.html#faketelescope.jids',
+                                                                               'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.job_page': ( 'fakeserver.html#faketelescope.job_page',
+                                                                                   'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.payload': ( 'fakeserver.html#faketelescope.payload',
+                                                                                  'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.request_page': ( 'fakeserver.html#faketelescope.request_page',
+                                                                                       'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.search_page': ( 'fakeserver.html#faketelescope.search_page',
+                                                                                      'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.start_server': ( 'fakeserver.html#faketelescope.start_server',
+                                                                                       'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.stop_server': ( 'fakeserver.html#faketelescope.stop_server',
+                                                                                      'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.FakeTelescope.url': ('fakeserver.html#faketelescope.url', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler': ('fakeserver.html#_fakehandler', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.do_GET': ( 'fakeserver.html#_fakehandler.do_get',
+                                                                                'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.do_POST': ( 'fakeserver.html#_fakehandler.do_post',
+                                                                                 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.handle_call': ( 'fakeserver.html#_fakehandler.handle_call',
+                                                                                     'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.log_message': ( 'fakeserver.html#_fakehandler.log_message',
+                                                                                     'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.respond': ( 'fakeserver.html#_fakehandler.respond',
+                                                                                 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._FakeHandler.send': ('fakeserver.html#_fakehandler.send', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._fill': ('fakeserver.html#_fill', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver._when': ('fakeserver.html#_when', 'ouscope/fakeserver.py'),
+                                    'ouscope.fakeserver.default_fixtures': ('fakeserver.html#default_fixtures', 'ouscope/fakeserver.py')},
+            'ouscope.gcvs': { 'ouscope.gcvs.GCVS': ('gcvs.html#gcvs', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.__init__': ('gcvs.html#gcvs.__init__', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.__len__': ('gcvs.html#gcvs.__len__', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.cone': ('gcvs.html#gcvs.cone', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.cones': ('gcvs.html#gcvs.cones', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.fetch': ('gcvs.html#gcvs.fetch', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.in_footprint': ('gcvs.html#gcvs.in_footprint', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.GCVS.in_footprints': ('gcvs.html#gcvs.in_footprints', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.gcvs_name': ('gcvs.html#gcvs_name', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.normalize_table': ('gcvs.html#normalize_table', 'ouscope/gcvs.py'),
+                              'ouscope.gcvs.unit_vectors': ('gcvs.html#unit_vectors', 'ouscope/gcvs.py')},
+            'ouscope.photometry': { 'ouscope.photometry.Ensemble': ('photometry.html#ensemble', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble.__init__': ('photometry.html#ensemble.__init__', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble.__len__': ('photometry.html#ensemble.__len__', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble._col': ('photometry.html#ensemble._col', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble.add': ('photometry.html#ensemble.add', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble.add_job': ('photometry.html#ensemble.add_job', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.Ensemble.solve': ('photometry.html#ensemble.solve', 'ouscope/photometry.py'),
+                                    'ouscope.photometry._chunk_photometry': ('photometry.html#_chunk_photometry', 'ouscope/photometry.py'),
+                                    'ouscope.photometry._task_photometry': ('photometry.html#_task_photometry', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.batch_photometry': ('photometry.html#batch_photometry', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.field_task': ('photometry.html#field_task', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.job_photometry': ('photometry.html#job_photometry', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.sequence_catalog': ('photometry.html#sequence_catalog', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.sequence_stars': ('photometry.html#sequence_stars', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.sky_to_pixels': ('photometry.html#sky_to_pixels', 'ouscope/photometry.py'),
+                                    'ouscope.photometry.stack_photometry': ('photometry.html#stack_photometry', 'ouscope/photometry.py')},
+            'ouscope.process': { 'ouscope.process._gcvs': ('process.html#_gcvs', 'ouscope/process.py'),
+                                 'ouscope.process._marker': ('process.html#_marker', 'ouscope/process.py'),
+                                 'ouscope.process._solver_pool': ('process.html#_solver_pool', 'ouscope/process.py'),
+                                 'ouscope.process._warp': ('process.html#_warp', 'ouscope/process.py'),
+                                 'ouscope.process.analyse_job': ('process.html#analyse_job', 'ouscope/process.py'),
                                  'ouscope.process.make_color_image': ('process.html#make_color_image', 'ouscope/process.py'),
                                  'ouscope.process.plot_sequence': ('process.html#plot_sequence', 'ouscope/process.py'),
-                                 'ouscope.process.process_job': ('process.html#process_job', 'ouscope/process.py')},
-            'ouscope.solver': { 'ouscope.solver.Solver': ('solver.html#solver', 'ouscope/solver.py'),
+                                 'ouscope.process.process_job': ('process.html#process_job', 'ouscope/process.py'),
+                                 'ouscope.process.register_layers': ('process.html#register_layers', 'ouscope/process.py')},
+            'ouscope.solver': { 'ouscope.solver.IndexSet': ('solver.html#indexset', 'ouscope/solver.py'),
+                                'ouscope.solver.IndexSet.__init__': ('solver.html#indexset.__init__', 'ouscope/solver.py'),
+                                'ouscope.solver.IndexSet.__len__': ('solver.html#indexset.__len__', 'ouscope/solver.py'),
+                                'ouscope.solver.IndexSet.config': ('solver.html#indexset.config', 'ouscope/solver.py'),
+                                'ouscope.solver.IndexSet.select': ('solver.html#indexset.select', 'ouscope/solver.py'),
+                                'ouscope.solver.Solver': ('solver.html#solver', 'ouscope/solver.py'),
                                 'ouscope.solver.Solver.__init__': ('solver.html#solver.__init__', 'ouscope/solver.py'),
+                                'ouscope.solver.Solver._cache_path': ('solver.html#solver._cache_path', 'ouscope/solver.py'),
+                                'ouscope.solver.Solver._frame_telescope': ('solver.html#solver._frame_telescope', 'ouscope/solver.py'),
                                 'ouscope.solver.Solver._getFrameRaDec': ('solver.html#solver._getframeradec', 'ouscope/solver.py'),
+                                'ouscope.solver.Solver._legacy_lookup': ('solver.html#solver._legacy_lookup', 'ouscope/solver.py'),
                                 'ouscope.solver.Solver._solveField_local': ('solver.html#solver._solvefield_local', 'ouscope/solver.py'),
-                                'ouscope.solver.Solver.solve': ('solver.html#solver.solve', 'ouscope/solver.py')},
+                                'ouscope.solver.Solver.solve': ('solver.html#solver.solve', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool': ('solver.html#solverpool', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.__enter__': ('solver.html#solverpool.__enter__', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.__exit__': ('solver.html#solverpool.__exit__', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.__init__': ('solver.html#solverpool.__init__', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool._run': ('solver.html#solverpool._run', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.cancel': ('solver.html#solverpool.cancel', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.shutdown': ('solver.html#solverpool.shutdown', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.solve_first': ('solver.html#solverpool.solve_first', 'ouscope/solver.py'),
+                                'ouscope.solver.SolverPool.submit': ('solver.html#solverpool.submit', 'ouscope/solver.py'),
+                                'ouscope.solver.WCSHints': ('solver.html#wcshints', 'ouscope/solver.py'),
+                                'ouscope.solver.WCSHints.__init__': ('solver.html#wcshints.__init__', 'ouscope/solver.py'),
+                                'ouscope.solver.WCSHints.__len__': ('solver.html#wcshints.__len__', 'ouscope/solver.py'),
+                                'ouscope.solver.WCSHints.add': ('solver.html#wcshints.add', 'ouscope/solver.py'),
+                                'ouscope.solver.WCSHints.nearest': ('solver.html#wcshints.nearest', 'ouscope/solver.py'),
+                                'ouscope.solver._set_option': ('solver.html#_set_option', 'ouscope/solver.py'),
+                                'ouscope.solver.find_sources': ('solver.html#find_sources', 'ouscope/solver.py'),
+                                'ouscope.solver.frame_key': ('solver.html#frame_key', 'ouscope/solver.py'),
+                                'ouscope.solver.kill_solver': ('solver.html#kill_solver', 'ouscope/solver.py'),
+                                'ouscope.solver.radec_to_healpix': ('solver.html#radec_to_healpix', 'ouscope/solver.py'),
+                                'ouscope.solver.refine_wcs': ('solver.html#refine_wcs', 'ouscope/solver.py'),
+                                'ouscope.solver.write_xylist': ('solver.html#write_xylist', 'ouscope/solver.py')},
             'ouscope.util': { 'ouscope.util.Telescope.get_object_obs': ('util.html#telescope.get_object_obs', 'ouscope/util.py'),
                               'ouscope.util.print_dict': ('util.html#print_dict', 'ouscope/util.py')},
-            'ouscope.vs': { 'ouscope.vs.Telescope.submitVarStar': ('vs.html#telescope.submitvarstar', 'ouscope/vs.py'),
+            'ouscope.vs': { 'ouscope.vs.SequenceService': ('vs.html#sequenceservice', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.__init__': ('vs.html#sequenceservice.__init__', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.fetch': ('vs.html#sequenceservice.fetch', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.get': ('vs.html#sequenceservice.get', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.key': ('vs.html#sequenceservice.key', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.prefetch': ('vs.html#sequenceservice.prefetch', 'ouscope/vs.py'),
+                            'ouscope.vs.SequenceService.session': ('vs.html#sequenceservice.session', 'ouscope/vs.py'),
+                            'ouscope.vs.Telescope.submitVarStar': ('vs.html#telescope.submitvarstar', 'ouscope/vs.py'),
+                            'ouscope.vs.Telescope.submitVarStars': ('vs.html#telescope.submitvarstars', 'ouscope/vs.py'),
+                            'ouscope.vs.cache_dir': ('vs.html#cache_dir', 'ouscope/vs.py'),
                             'ouscope.vs.get_VS_sequence': ('vs.html#get_vs_sequence', 'ouscope/vs.py'),
-                            'ouscope.vs.prtMag': ('vs.html#prtmag', 'ouscope/vs.py')},
-            'ouscope.vsapp': {'ouscope.vsapp.make_color_image': ('vsapp.html#make_color_image', 'ouscope/vsapp.py')}}}
+                            'ouscope.vs.parse_sequence': ('vs.html#parse_sequence', 'ouscope/vs.py'),
+                            'ouscope.vs.prtMag': ('vs.html#prtmag', 'ouscope/vs.py'),
+                            'ouscope.vs.sequence_service': ('vs.html#sequence_service', 'ouscope/vs.py')},
+            'ouscope.vsapp': {}}}
@@ -0,0 +1,105 @@
+"""Client throughput benchmarks against the local `FakeTelescope`."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../14_bench.ipynb.
+
+# %% ../14_bench.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['HEAVY_MODULES', 'bench_client', 'ouscope_bench', 'import_time']
+
+# %% ../14_bench.ipynb 4
+import os
+import sys
+import time
+import subprocess
+import tempfile
+from fastcore.script import call_parse
+from ouscope.core import Telescope
+import ouscope.download  # noqa: F401 - adds Telescope.download_many
+from ouscope.fakeserver import FakeTelescope
+
+# %% ../14_bench.ipynb 6
+def bench_client(n=200,             # Number of requests/jobs on the server
+                 latency=0.02,      # Latency of every response (s)
+                 workers=(1, 4, 16),# Numbers of concurrent workers to test
+                 downloads=20,      # Number of downloaded observations
+                 shape=(256, 256),  # Size of the synthetic images
+                 tasks=('get_jobs', 'get_obs_range', 'download_many', 'submit_batch'),
+                ):
+    '''
+    Measure the throughput of the client against the local fake server.
+    '''
+    rows = []
+    def row(task, w, items, dt, unit, scale=1):
+        rows.append({'task': task, 'workers': w, 'items': items, 'seconds': round(dt, 3), 
+                     'rate': round(scale*items/dt, 2), 'unit': unit, 'peak': srv.peak})
+        srv.peak = 0
+    with tempfile.TemporaryDirectory() as td:
+        for w in workers:
+            with FakeTelescope(n=n, latency=latency, shape=shape) as srv:
+                scope = Telescope('bench', 'bench', cache=os.path.join(td, f'jobs{w}'), meta=None, url=srv.url)
+                scope.workers = w
+                scope.sched.first = latency
+                srv.peak = 0
+                jobs = []
+                if 'get_jobs' in tasks or 'download_many' in tasks:
+                    t0 = time.perf_counter()
+                    jobs = list(scope.get_jobs(srv.jids, workers=w))
+                    if 'get_jobs' in tasks:
+                        row('get_jobs', w, len(jobs), time.perf_counter() - t0, 'jobs/s')
+                if 'get_obs_range' in tasks:
+                    t0 = time.perf_counter()
+                    jids = scope.get_obs_range(srv.start, srv.end, window=1)
+                    row('get_obs_range', w, len(jids), time.perf_counter() - t0, 'jobs/s')
+                if 'download_many' in tasks:
+                    t0 = time.perf_counter()
+                    files = [fn for obs, fn in scope.download_many(jobs[:downloads], workers=w) if fn]
+                    size = sum(os.path.getsize(fn) for fn in files)
+                    row('download_many', w, size, time.perf_counter() - t0, 'MB/s', 1e-6)
+                if 'submit_batch' in tasks:
+                    targets = [{'name': f'Bench {i}', 'obj': _ZeroCoord()} for i in range(n//4)]
+                    t0 = time.perf_counter()
+                    res = scope.submit_batch(targets, workers=w, dedupe=False)
+                    row('submit_batch', w, sum(bool(ok) for ok, _ in res.values()), 
+                        time.perf_counter() - t0, 'requests/s')
+    return rows
+
+# %% ../14_bench.ipynb 7
+class _ZeroCoord:
+    '''Stand-in of the SkyCoord for the request constructor'''
+    class _Angle:
+        def to_string(self, **kwargs):
+            return '00:00:00.00'
+    ra = dec = _Angle()
+
+# %% ../14_bench.ipynb 8
+@call_parse
+def ouscope_bench(n: int = 200, # Number of requests/jobs on the server
+                  latency: float = 0.02, # Latency of every response (s)
+                  workers: str = '1,4,16', # Comma separated numbers of workers
+                  downloads: int = 20, # Number of downloaded observations
+                 ):
+    "Benchmark the client throughput against the local fake server."
+    for r in bench_client(n, latency, tuple(int(w) for w in workers.split(',')), downloads):
+        print(f"{r['task']:15} {r['workers']:3d} {r['seconds']:8.2f}s {r['rate']:10.2f} {r['unit']}")
+
+# %% ../14_bench.ipynb 12
+HEAVY_MODULES = ('astropy', 'astroquery', 'matplotlib', 'photutils', 'astroalign', 
+                 'mechanicalsoup', 'bs4', 'tqdm', 'IPython', 'numpy', 'sqlitedict')
+
+def import_time(module, python=None):
+    '''
+    Import the module in a fresh interpreter with `-X importtime`.
+    Returns dictionary of cumulative import times (s) of the loaded modules.
+    '''
+    r = subprocess.run([python or sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                       capture_output=True, text=True, check=True)
+    times = {}
+    for ln in r.stderr.splitlines():
+        if not ln.startswith('import time:'):
+            continue
+        _, cum, name = ln[len('import time:'):].split('|')
+        if cum.strip().isdigit():
+            times[name.strip()] = int(cum)/1e6
+    return times
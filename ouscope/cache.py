@@ -0,0 +1,216 @@
+"""Size-bounded, indexed store of the downloaded observations."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../11_cache.ipynb.
+
+# %% ../11_cache.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['ObsCache', 'migrate_cache']
+
+# %% ../11_cache.ipynb 4
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from fastcore.basics import patch
+from fastcore.script import call_parse
+
+# %% ../11_cache.ipynb 6
+def parse_size(s):
+    '''
+    Convert size with optional K/M/G/T suffix (powers of 1024) to bytes.
+    '''
+    if s is None or isinstance(s, int):
+        return s
+    s = s.strip().upper().rstrip('B')
+    mult = 1
+    if s and s[-1] in 'KMGT':
+        mult = 1 << (10*('KMGT'.index(s[-1])+1))
+        s = s[:-1]
+    return int(float(s)*mult)
+
+def file_checksum(fp, chunksize=1<<20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(fp, 'rb') as f:
+        while chunk := f.read(chunksize):
+            h.update(chunk)
+    return h.hexdigest()
+
+# %% ../11_cache.ipynb 7
+class ObsCache:
+    '''
+    Size-bounded store of observation files indexed in SQLite
+    with least-recently-used eviction.
+    '''
+    def __init__(self, root='.cache/jobs', budget=None):
+        self.root = root
+        self.budget = parse_size(budget)
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), 
+                                  check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS files (
+                              name TEXT PRIMARY KEY, 
+                              size INTEGER, 
+                              checksum TEXT, 
+                              atime REAL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS files_atime ON files (atime)')
+
+    def path(self, name):
+        '''
+        Location of the file in the cache.
+        '''
+        h = hashlib.sha1(name.encode()).hexdigest()
+        return os.path.join(self.root, h[:2], h[2:4], name)
+
+# %% ../11_cache.ipynb 8
+@patch
+def get(self: ObsCache, name):
+    '''
+    Return path of the cached file and mark it as used, or None if the file is not in the cache.
+    Files missing from the index (e.g. left by an interrupted download) 
+    or differing in size from the indexed ones are not served.
+    '''
+    fp = self.path(name)
+    with self.lock:
+        row = self.db.execute('SELECT size FROM files WHERE name=?', (name,)).fetchone()
+        if row is None:
+            return None
+        if not os.path.isfile(fp) or os.path.getsize(fp) != row[0]:
+            self.db.execute('DELETE FROM files WHERE name=?', (name,))
+            return None
+        self.db.execute('UPDATE files SET atime=? WHERE name=?', (time.time(), name))
+    return fp
+
+# %% ../11_cache.ipynb 9
+@patch
+def put(self: ObsCache, name, src=None):
+    '''
+    Register the file in the cache. The file is moved from the src path
+    if it is given, otherwise it must be already in its place (`path(name)`).
+    Returns the path of the file in the cache.
+    '''
+    fp = self.path(name)
+    if src is not None and os.path.abspath(src) != os.path.abspath(fp):
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        shutil.move(src, fp)
+    row = (name, os.path.getsize(fp), file_checksum(fp), time.time())
+    with self.lock:
+        self.db.execute('INSERT OR REPLACE INTO files VALUES (?,?,?,?)', row)
+    self.evict(keep=name)
+    return fp
+
+# %% ../11_cache.ipynb 10
+@patch
+def remove(self: ObsCache, name):
+    '''
+    Remove the file from the cache.
+    '''
+    fp = self.path(name)
+    with self.lock:
+        self.db.execute('DELETE FROM files WHERE name=?', (name,))
+        if os.path.isfile(fp):
+            os.remove(fp)
+
+@patch
+def total(self: ObsCache):
+    '''
+    Total size of the files in the cache.
+    '''
+    with self.lock:
+        return self.db.execute('SELECT COALESCE(SUM(size), 0) FROM files').fetchone()[0]
+
+@patch
+def verify(self: ObsCache, name):
+    '''
+    Check the file against the size and checksum stored in the index.
+    '''
+    fp = self.path(name)
+    with self.lock:
+        row = self.db.execute('SELECT size, checksum FROM files WHERE name=?', (name,)).fetchone()
+    return (row is not None and os.path.isfile(fp) and 
+            os.path.getsize(fp) == row[0] and file_checksum(fp) == row[1])
+
+# %% ../11_cache.ipynb 11
+@patch
+def evict(self: ObsCache, budget=None, keep=None):
+    '''
+    Remove least recently used files until the cache fits in the budget
+    (`self.budget` by default). The `keep` file is never removed.
+    Returns the number of removed files.
+    '''
+    log = logging.getLogger(__name__)
+    budget = self.budget if budget is None else parse_size(budget)
+    if budget is None:
+        return 0
+    n = 0
+    total = self.total()
+    if total <= budget:
+        return n
+    with self.lock:
+        cur = self.db.execute('SELECT name, size FROM files ORDER BY atime')
+    while total > budget:
+        # Stream the oldest files in batches instead of loading the whole index
+        with self.lock:
+            rows = cur.fetchmany(64)
+        if not rows:
+            break
+        for name, size in rows:
+            if name == keep:
+                continue
+            log.info('Evicting %s (%d bytes)', name, size)
+            self.remove(name)
+            total -= size
+            n += 1
+            if total <= budget:
+                break
+    cur.close()
+    return n
+
+# %% ../11_cache.ipynb 13
+_obs_name = re.compile(r'^(art_)?\d+\.(fits|zip)$')
+
+# %% ../11_cache.ipynb 14
+@patch
+def migrate(self: ObsCache, src=None):
+    '''
+    Move observation files from the old cache tree (root of this cache 
+    by default) into the cache. Returns the number of moved files.
+    '''
+    log = logging.getLogger(__name__)
+    src = self.root if src is None else src
+    n = 0
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if not _obs_name.match(fn):
+                continue
+            fp = os.path.join(dirpath, fn)
+            if os.path.abspath(fp) == os.path.abspath(self.path(fn)):
+                continue
+            log.info('Moving %s', fp)
+            self.put(fn, fp)
+            n += 1
+    # Remove old shard directories left empty
+    for dirpath, dirnames, filenames in os.walk(src, topdown=False):
+        if dirpath != src and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return n
+
+# %% ../11_cache.ipynb 15
+@call_parse
+def migrate_cache(src: str, # Directory with the old cache tree
+                  dst: str = None, # Target cache directory (src by default)
+                  budget: str = None, # Size budget of the cache (e.g. 50G)
+                 ):
+    "Move the observation cache into the hashed, indexed layout."
+    cache = ObsCache(src if dst is None else dst, budget)
+    n = cache.migrate(src)
+    print(f'Moved {n} files. Cache size: {cache.total()/(1<<20):.1f} MiB')
+    cache.evict()
@@ -0,0 +1,163 @@
+"""Local, indexed catalog of the user requests and jobs."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../16_catalog.ipynb.
+
+# %% ../16_catalog.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['Catalog']
+
+# %% ../16_catalog.ipynb 4
+import os
+import sqlite3
+import logging
+import threading
+from fastcore.basics import patch
+from ouscope.core import Telescope, parse_epoch
+
+# %% ../16_catalog.ipynb 6
+class Catalog:
+    '''
+    SQLite catalog of requests and jobs.
+    '''
+    def __init__(self, fn='.cache/catalog.sqlite'):
+        self.fn = fn
+        if os.path.dirname(fn):
+            os.makedirs(os.path.dirname(fn), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fn, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS requests (
+                rid INTEGER PRIMARY KEY, folder INTEGER, objectname TEXT,
+                status INTEGER, requesttime INTEGER);
+            CREATE INDEX IF NOT EXISTS requests_object ON requests (objectname);
+            CREATE INDEX IF NOT EXISTS requests_status ON requests (status);
+            CREATE TABLE IF NOT EXISTS jobs (
+                jid INTEGER PRIMARY KEY, completion INTEGER, tele TEXT, 
+                filter TEXT, exp TEXT, type TEXT, oid TEXT);
+            CREATE INDEX IF NOT EXISTS jobs_completion ON jobs (completion);
+            CREATE TABLE IF NOT EXISTS job_requests (
+                jid INTEGER, rid INTEGER, PRIMARY KEY (jid, rid));
+            CREATE INDEX IF NOT EXISTS job_requests_rid ON job_requests (rid);
+        ''')
+
+    def query(self, sql, args=()):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+# %% ../16_catalog.ipynb 7
+@patch
+def add_requests(self: Catalog, reqs, folder=1):
+    '''
+    Insert or update the requests (rows of the request list).
+    '''
+    rows = [(int(rq['id']), folder, rq['objectname'].strip(), int(rq['status']), 
+             int(rq['requesttime'])) for rq in reqs]
+    with self.lock:
+        self.db.execute('BEGIN')
+        self.db.executemany('INSERT OR REPLACE INTO requests VALUES (?,?,?,?,?)', rows)
+        self.db.execute('COMMIT')
+
+@patch
+def add_job(self: Catalog, job, rid=None):
+    '''
+    Insert the job (from `get_job`) with all the requests it serves.
+    '''
+    rids = {int(r[1:]) for r in job.get('rid', '').split() if r[1:].isdigit()}
+    if rid is not None:
+        rids.add(int(rid))
+    with self.lock:
+        self.db.execute('BEGIN')
+        self.db.execute('INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?)',
+                        (int(job['jid']), parse_epoch(job.get('completion')), job.get('tele'),
+                         job.get('filter'), job.get('exp'), job.get('type'), job.get('oid')))
+        self.db.executemany('INSERT OR IGNORE INTO job_requests VALUES (?,?)', 
+                            [(int(job['jid']), r) for r in rids])
+        self.db.execute('COMMIT')
+
+@patch
+def link(self: Catalog, jid, rid):
+    '''
+    Record that the job jid serves the request rid.
+    '''
+    with self.lock:
+        self.db.execute('INSERT OR IGNORE INTO job_requests VALUES (?,?)', (int(jid), int(rid)))
+
+# %% ../16_catalog.ipynb 8
+@patch
+def sync_state(self: Catalog, folder=1):
+    '''
+    The `sync_user_requests` state of the folder derived from the catalog.
+    '''
+    top, = self.query('SELECT COALESCE(MAX(rid), 0) FROM requests WHERE folder=?', (folder,))[0]
+    final = ','.join(str(s) for s in Telescope.FINAL_STATUS)
+    rows = self.query(f'SELECT rid, status FROM requests WHERE folder=? AND status NOT IN ({final})', (folder,))
+    return {'top': top, 'open': {rid: {'id': str(rid), 'status': str(status)} for rid, status in rows}}
+
+@patch
+def unlinked_requests(self: Catalog):
+    '''
+    Complete requests without known job.
+    '''
+    return [r for r, in self.query('''SELECT rid FROM requests WHERE status=8 AND 
+                                      rid NOT IN (SELECT rid FROM job_requests)''')]
+
+@patch
+def missing_jobs(self: Catalog):
+    '''
+    Jobs linked to requests but not present in the catalog.
+    '''
+    return [j for j, in self.query('SELECT DISTINCT jid FROM job_requests WHERE jid NOT IN (SELECT jid FROM jobs)')]
+
+# %% ../16_catalog.ipynb 9
+@patch
+def object_jobs(self: Catalog, obj: str, status=8):
+    '''
+    List of (jid, rid) of the jobs of the object, newest request first.
+    '''
+    return self.query('''SELECT jr.jid, r.rid FROM requests r JOIN job_requests jr ON jr.rid = r.rid
+                         WHERE r.objectname = ? AND r.status = ? 
+                         ORDER BY r.requesttime DESC''', (obj.strip(), status))
+
+@patch
+def jobs_between(self: Catalog, start, end):
+    '''
+    Jobs completed between start and end (seconds from the epoch), newest first.
+    '''
+    return [j for j, in self.query('SELECT jid FROM jobs WHERE completion BETWEEN ? AND ? ORDER BY completion DESC', 
+                                   (start, end))]
+
+@patch
+def job_requests(self: Catalog, jid):
+    '''
+    Requests served by the job.
+    '''
+    return [r for r, in self.query('SELECT rid FROM job_requests WHERE jid = ? ORDER BY rid', (jid,))]
+
+# %% ../16_catalog.ipynb 10
+@patch
+def sync_catalog(self: Telescope, catalog: Catalog=None, folder: int =1):
+    '''
+    Bring the catalog (`self.catalog` by default, created next to the 
+    jobs cache) up to date with the folder. Returns the catalog.
+    '''
+    log = logging.getLogger(__name__)
+    if catalog is None:
+        catalog = self.__dict__.get('catalog')
+        if catalog is None:
+            catalog = self.catalog = Catalog(os.path.join(os.path.dirname(self.cache) or '.', 'catalog.sqlite'))
+    changed = list(self.sync_user_requests(folder, state=catalog.sync_state(folder)))
+    log.info('%d new or changed requests', len(changed))
+    catalog.add_requests(changed, folder)
+    errors = {}
+    for rq in self.get_requests(catalog.unlinked_requests(), errors=errors):
+        if rq.get('jid', '').strip().isdigit() and int(rq['jid']):
+            catalog.link(rq['jid'], rq['rid'])
+    for job in self.get_jobs(catalog.missing_jobs(), errors=errors):
+        catalog.add_job(job)
+    if errors:
+        # Still unlinked or missing - retried in the next sync
+        log.warning('%d requests or jobs failed to load', len(errors))
+    return catalog
@@ -6,7 +6,7 @@
 from __future__ import annotations
 
 # %% auto 0
-__all__ = ['Telescope']
+__all__ = ['MetaCache', 'ReadyScheduler', 'HttpMetrics', 'Telescope']
 
 # %% ../10_core.ipynb 3
 from fastcore.basics import patch
@@ -14,28 +14,339 @@ from fastcore.basics import patch
 import logging
 import requests
 from requests import session
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, parse_qs
 
 import configparser
 import diskcache
-from bs4 import BeautifulSoup
+from lxml import etree
+import re
 import json
-import time, datetime
-import os, tempfile, shutil, sys
+import time, calendar
+import os, shutil, sys
+from tempfile import SpooledTemporaryFile
 from os import path
 from os.path import expanduser
 
 from zipfile import ZipFile, BadZipFile
-from io import StringIO, BytesIO
-from tqdm.auto import tqdm
+from ouscope.cache import ObsCache
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import threading
+import heapq, itertools, random
 
-# %% ../10_core.ipynb 4
+# %% ../10_core.ipynb 5
 def cleanup(s: str) -> str:
     '''
     Remove non-asci characters from the string.
     '''
     return s.encode('ascii','ignore').decode('ascii','ignore')
 
-# %% ../10_core.ipynb 6
+# %% ../10_core.ipynb 7
+class MetaCache:
+    '''
+    Persistent cache of the job/request metadata scraped from the website.
+    Records in the final state never expire. Other records expire after
+    `ttl` seconds and are dropped as soon as their status changes.
+    Only the lookups with `get` are counted in the statistics - the 
+    bookkeeping goes directly to the `db` store.
+    '''
+    def __init__(self, directory='.cache/meta', ttl=300):
+        self.ttl = ttl
+        self.db = diskcache.Cache(directory)
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        '''
+        Return cached record for the key or None.
+        '''
+        obs = self.db.get(key)
+        with self.lock:
+            if obs is None:
+                self.misses += 1
+            else :
+                self.hits += 1
+        return obs
+
+    def invalidate(self, key, status):
+        '''
+        Drop the record of the key if its status is different.
+        '''
+        obs = self.db.get(key)
+        if obs is not None and obs.get('status') != status:
+            self.db.delete(key)
+
+    def set(self, key, obs, final=False):
+        self.db.set(key, obs, expire=None if final else self.ttl)
+
+    def stats(self, reset=False):
+        '''
+        Return dictionary of hits and misses of the `get` lookups
+        since the cache was opened (or the counters were reset).
+        '''
+        with self.lock:
+            res = {'hits': self.hits, 'misses': self.misses}
+            if reset:
+                self.hits = self.misses = 0
+        return res
+
+# %% ../10_core.ipynb 9
+class ReadyScheduler:
+    '''
+    Shared poller of the server-side jobs we are waiting for
+    (image engine jobs, processed images). Every job is described 
+    by a `check` function returning None while the job is not ready.
+    All pending checks are polled by one thread with exponential
+    backoff (from `first` up to `max_delay` seconds, multiplied by
+    `factor` after each miss) and random `jitter`.
+    '''
+    def __init__(self, first=1.0, factor=1.5, max_delay=15, jitter=0.2, workers=4):
+        self.first = first
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.workers = workers
+        self.heap = []
+        self.cv = threading.Condition()
+        self.seq = itertools.count()
+        self.pool = None
+        self.thread = None
+        self.polls = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _push(self, t, delay, deadline, check, fut):
+        with self.cv:
+            heapq.heappush(self.heap, (t, next(self.seq), delay, deadline, check, fut))
+            if self.thread is None:
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(max_workers=self.workers)
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+            self.cv.notify()
+
+    def submit(self, check, timeout=None, first=None) -> Future:
+        '''
+        Schedule polling of the `check` function. Returns a Future 
+        resolved with the first not-None result of the check. 
+        The future fails with TimeoutError after `timeout` seconds.
+        '''
+        fut = Future()
+        fut.set_running_or_notify_cancel()
+        now = time.monotonic()
+        first = self.first if first is None else first
+        self._push(now + first, first or self.first, 
+                   None if timeout is None else now + timeout, check, fut)
+        return fut
+
+    def _loop(self):
+        while True:
+            with self.cv:
+                if not self.heap:
+                    # Nothing to do - the thread is restarted by the next submit
+                    self.thread = None
+                    return
+                t = self.heap[0][0]
+                now = time.monotonic()
+                if t > now:
+                    self.cv.wait(t - now)
+                    continue
+                entry = heapq.heappop(self.heap)
+            self.pool.submit(self._check, *entry[2:])
+
+    def _check(self, delay, deadline, check, fut):
+        if fut.done():
+            return
+        self.polls += 1
+        try :
+            res = check()
+        except Exception as e:
+            fut.set_exception(e)
+            return
+        if res is not None:
+            fut.set_result(res)
+            return
+        now = time.monotonic()
+        if deadline is not None and now > deadline:
+            fut.set_exception(TimeoutError())
+            return
+        delay = min(delay*self.factor, self.max_delay)
+        self._push(now + delay*(1 + self.jitter*(2*random.random()-1)), delay, deadline, check, fut)
+
+# %% ../10_core.ipynb 12
+class HttpMetrics:
+    '''
+    Thread-safe per-endpoint statistics of the HTTP calls.
+    '''
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.dumper = None
+
+    def _entry(self, endpoint):
+        e = self.data.get(endpoint)
+        if e is None:
+            e = self.data[endpoint] = {'count': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0,
+                                       'bytes_in': 0, 'bytes_out': 0, 
+                                       'buckets': [0]*len(self.BUCKETS)}
+        return e
+
+    def record(self, endpoint, seconds, bytes_in=0, bytes_out=0, error=False):
+        '''
+        Record one call of the endpoint.
+        '''
+        with self.lock:
+            e = self._entry(endpoint)
+            e['count'] += 1
+            e['errors'] += bool(error)
+            e['seconds'] += seconds
+            e['bytes_in'] += bytes_in
+            e['bytes_out'] += bytes_out
+            for n, le in enumerate(self.BUCKETS):
+                if seconds <= le:
+                    e['buckets'][n] += 1
+                    break
+
+    def received(self, endpoint, nbytes):
+        '''
+        Count the bytes of the response body read from the endpoint.
+        '''
+        with self.lock:
+            self._entry(endpoint)['bytes_in'] += nbytes
+
+    def retry(self, endpoint):
+        '''
+        Count a retry of the failed call of the endpoint.
+        '''
+        with self.lock:
+            self._entry(endpoint)['retries'] += 1
+
+    def reset(self):
+        with self.lock:
+            self.data = {}
+
+    def snapshot(self):
+        '''
+        Copy of the statistics. Histogram buckets are cumulative 
+        and keyed by their upper bound.
+        '''
+        with self.lock:
+            snap = {}
+            for ep, e in self.data.items():
+                s = dict(e)
+                s['buckets'] = dict(zip((str(le) for le in self.BUCKETS), 
+                                        itertools.accumulate(e['buckets'])))
+                snap[ep] = s
+            return snap
+
+    def summary(self):
+        '''
+        List of (endpoint, count, total seconds, mean seconds, error rate)
+        sorted by the total time spent in the endpoint.
+        '''
+        rows = [(ep, e['count'], e['seconds'], e['seconds']/max(1, e['count']), 
+                 e['errors']/max(1, e['count'])) for ep, e in self.snapshot().items()]
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def to_json(self):
+        return json.dumps({'time': time.time(), 'endpoints': self.snapshot()}, indent=1)
+
+    def to_prometheus(self, prefix='ouscope_http'):
+        '''
+        Statistics in the Prometheus text exposition format.
+        '''
+        snap = self.snapshot()
+        out = []
+        def metric(name, kind, hlp, rows):
+            out.append(f'# HELP {prefix}_{name} {hlp}')
+            out.append(f'# TYPE {prefix}_{name} {kind}')
+            out.extend(rows)
+        lbl = lambda ep: 'endpoint="%s"' % ep.replace('\\', '\\\\').replace('"', '\\"')
+        hist = []
+        for ep, e in snap.items():
+            for le, n in e['buckets'].items():
+                hist.append(f'{prefix}_request_duration_seconds_bucket{{{lbl(ep)},le="{"+Inf" if le == "inf" else le}"}} {n}')
+            hist.append(f'{prefix}_request_duration_seconds_sum{{{lbl(ep)}}} {e["seconds"]}')
+            hist.append(f'{prefix}_request_duration_seconds_count{{{lbl(ep)}}} {e["count"]}')
+        metric('request_duration_seconds', 'histogram', 'Time to the response headers.', hist)
+        for key, hlp in (('errors', 'Failed calls.'), ('retries', 'Retried calls.'),
+                         ('bytes_in', 'Response bytes.'), ('bytes_out', 'Request bytes.')):
+            metric(f'{key}_total', 'counter', hlp, 
+                   [f'{prefix}_{key}_total{{{lbl(ep)}}} {e[key]}' for ep, e in snap.items()])
+        return '\n'.join(out) + '\n'
+
+    def dump(self, fn):
+        '''
+        Atomically write the statistics into the file. Files with `.prom` 
+        extension get the Prometheus text format, others JSON.
+        '''
+        with open(fn + '.tmp', 'w') as f:
+            f.write(self.to_prometheus() if fn.endswith('.prom') else self.to_json())
+        os.replace(fn + '.tmp', fn)
+
+    def start_dump(self, fn, interval=60):
+        '''
+        Dump the statistics into the file every `interval` seconds.
+        '''
+        def loop(stop):
+            while not stop.wait(interval):
+                self.dump(fn)
+        self.stop_dump()
+        stop = threading.Event()
+        self.dumper = (stop, threading.Thread(target=loop, args=(stop,), daemon=True))
+        self.dumper[1].start()
+
+    def stop_dump(self):
+        if self.dumper is not None:
+            self.dumper[0].set()
+            self.dumper = None
+
+# %% ../10_core.ipynb 13
+def endpoint_name(req):
+    '''
+    Logical endpoint of the prepared request.
+    '''
+    name = urlsplit(req.url).path.rsplit('/', 1)[-1]
+    if name == 'api-user.php' and req.body:
+        body = req.body.decode() if isinstance(req.body, bytes) else req.body
+        q = parse_qs(body)
+        name += ':%s/%s' % (q.get('module', ['?'])[0], q.get('request', ['?'])[0])
+    return name
+
+class MeteredAdapter(HTTPAdapter):
+    '''
+    Connection adapter recording all calls in the `HttpMetrics`.
+    The time is measured to the response headers. The bytes of 
+    the body are counted as it is read - also for the streamed 
+    responses without the Content-Length.
+    '''
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        ep = endpoint_name(request)
+        sent = len(request.body) if request.body else 0
+        t0 = time.monotonic()
+        try :
+            rsp = super().send(request, **kwargs)
+        except Exception:
+            self.metrics.record(ep, time.monotonic() - t0, 0, sent, error=True)
+            raise
+        self.metrics.record(ep, time.monotonic() - t0, 0, sent, error=rsp.status_code >= 400)
+        stream = rsp.raw.stream
+        def counted(*args, **kwargs):
+            # Body chunks as they are read by `content` or `iter_content`
+            for chunk in stream(*args, **kwargs):
+                self.metrics.received(ep, len(chunk))
+                yield chunk
+        rsp.raw.stream = counted
+        return rsp
+
+# %% ../10_core.ipynb 15
 class Telescope:
     '''
     Main telescope website API class.
@@ -70,14 +381,23 @@ class Telescope:
         25: "Never rises",
         26: "Other error",
     }
+
+    # Requests in these states never change again
+    FINAL_STATUS=(8, 20, 21, 22, 23, 24, 25, 26)
+
+    # Maximal number of results of the job search
+    SEARCH_PAGE=1000
     
-    def __init__(self, user='', passwd='', config=None, cache='.cache/jobs'):
+    def __init__(self, user='', passwd='', config=None, cache='.cache/jobs', meta='.cache/meta', budget=None, url=None):
         if config is not None:
             conf = configparser.ConfigParser()
             conf.read(expanduser(config))
             self.user = conf['telescope.org']['user']
             self.passwd = conf['telescope.org']['password']
             self.cache = conf['cache']['jobs']
+            meta = conf['cache'].get('meta', meta)
+            budget = conf['cache'].get('budget', budget)
+            url = conf['telescope.org'].get('url', url)
         elif user and passwd :
             self.user=user
             self.passwd=passwd
@@ -87,18 +407,41 @@ class Telescope:
             print('WARNING: This object is not going to work!')
             return
             
+        if url is not None:
+            # Alternative site (e.g. the local `FakeTelescope`)
+            self.url=url
         self.s=None
         self.tout=60
         self.retry=15
+        self.spool=32<<20
+        self.workers=8
+        self.rate=None
+        self.meta=MetaCache(meta) if meta else None
+        self.metrics=HttpMetrics()
+        self.obscache=ObsCache(self.cache, budget) if self.cache else None
+        self.sched=ReadyScheduler(max_delay=self.retry)
         self.login()
 
 
-# %% ../10_core.ipynb 7
+# %% ../10_core.ipynb 16
 @patch
-def login(self: Telescope):
+def _new_session(self: Telescope):
     '''
-    Login into the telescope site using credentials initialised in the constructor.
-    Start and store persistent session with the website.
+    Create a http session with the connection pool large enough
+    to serve `self.workers` concurrent requests. All calls are
+    recorded in `self.metrics`.
+    '''
+    s=session()
+    adapter=MeteredAdapter(self.metrics, pool_connections=4, pool_maxsize=max(10, self.workers))
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    return s
+
+# %% ../10_core.ipynb 17
+@patch
+def _login_session(self: Telescope):
+    '''
+    Create a new session logged into the telescope site.
     '''
     log = logging.getLogger(__name__)
     payload = {'action': 'login',
@@ -106,11 +449,21 @@ def login(self: Telescope):
                'password': self.passwd,
                'stayloggedin': 'true'}
     log.debug('Get session ...')
-    self.s=session()
+    s=self._new_session()
     log.debug('Logging in ...')
-    self.s.post(self.url+'login.php', data=payload)
+    s.post(self.url+'login.php', data=payload)
+    return s
 
-# %% ../10_core.ipynb 8
+# %% ../10_core.ipynb 18
+@patch
+def login(self: Telescope):
+    '''
+    Login into the telescope site using credentials initialised in the constructor.
+    Start and store persistent session with the website.
+    '''
+    self.s=self._login_session()
+
+# %% ../10_core.ipynb 19
 @patch
 def logout(self: Telescope):
     '''
@@ -120,12 +473,32 @@ def logout(self: Telescope):
         self.s.post(self.url+'logout.php')
         self.s=None
 
-# %% ../10_core.ipynb 13
+# %% ../10_core.ipynb 20
+@patch
+def is_final(self: Telescope, status):
+    '''
+    Check if the request status (numeric code or status text) is final.
+    '''
+    try :
+        return int(status) in self.FINAL_STATUS
+    except ValueError:
+        return status in (self.REQUESTSTATUS_TEXTS[s] for s in self.FINAL_STATUS)
+
+# %% ../10_core.ipynb 21
 @patch
-def __do_api_call(self: Telescope, module, req, params=None):
-    rq = self.s.post(self.url+"api-user.php", {'module': module,
-                                               'request': req,
-                                               'params': {} if params is None else json.dumps(params)})
+def cache_stats(self: Telescope, reset=False):
+    '''
+    Hits and misses of the metadata cache.
+    '''
+    return self.meta.stats(reset) if self.meta is not None else None
+
+# %% ../10_core.ipynb 26
+@patch
+def __do_api_call(self: Telescope, module, req, params=None, s=None):
+    rq = (self.s if s is None else s).post(self.url+"api-user.php", 
+                                           {'module': module,
+                                            'request': req,
+                                            'params': {} if params is None else json.dumps(params)})
     return json.loads(rq.content)
 
 #| exporti
@@ -136,10 +509,131 @@ def __do_rm_api(self: Telescope, req, params=None):
 
 #| exporti
 @patch
-def __do_rc_api(self: Telescope, req, params=None):
-    return self.__do_api_call("request-constructor", req, params)
+def __do_rc_api(self: Telescope, req, params=None, s=None):
+    return self.__do_api_call("request-constructor", req, params, s)
+
+# %% ../10_core.ipynb 28
+def _timestamp(s):
+    t=s.split()
+    return t[3:6]+[t[6][1:]]+[t[7][:-1]]
+
+class FieldTable:
+    '''
+    Compiled table of fields scraped from the `label | value` table rows.
+    '''
+    def __init__(self, fields):
+        self.fields = {label: (key, conv) for label, key, conv in fields}
+        self.labels = re.compile('|'.join(re.escape(label) for label, _, _ in fields))
+
+_JOB_FIELDS=FieldTable((
+    ('Request ID', 'rid', lambda s: s[1:]),
+    ('Object Type', 'type', str),
+    ('Object ID', 'oid', str),
+    ('Telescope Type Name', 'tele', str),
+    ('Filter Type', 'filter', str),
+    ('Exposure Time', 'exp', str),
+    ('Completion Time', 'completion', _timestamp),
+    ('Status', 'status', lambda s: s == 'Success'),
+))
+
+_REQUEST_FIELDS=FieldTable((
+    ('Job ID', 'jid', lambda s: s[1:]),
+    ('Object Type', 'type', str),
+    ('Object ID', 'oid', str),
+    ('Object Name', 'name', str),
+    ('Telescope Type Name', 'tele_type', str),
+    ('Telescope Name', 'tele', str),
+    ('Filter Type', 'filter', str),
+    ('Dark Frame', 'dark', str),
+    ('Exposure Time', 'exp', str),
+    ('Request Time', 'requested', _timestamp),
+    ('Completion Time', 'completion', _timestamp),
+    ('Status', 'status', str.strip),
+))
+
+_rows_xp = etree.XPath('//tr[td]')
+_job_flat_xp = etree.XPath("//button[contains(@onclick, 'dl-flat')]/@onclick")
+_req_flat_xp = etree.XPath("//a[contains(@href, 'dl-flat')]/@href")
+_jid_links_xp = etree.XPath('//tr/descendant::a[1]/@href')
+_info_re = re.compile(r'var info = ([^\n]*)')
+
+# %% ../10_core.ipynb 29
+def parse_fields(page, table: FieldTable, obs=None):
+    '''
+    Extract the fields described by the table from the page (str or bytes).
+    Returns tuple of the dictionary of the fields and the page tree.
+    '''
+    obs = {} if obs is None else obs
+    tree = etree.HTML(page)
+    if tree is None:
+        return obs, tree
+    for tr in _rows_xp(tree):
+        txt=''
+        for td in tr.iter('td'):
+            val = ''.join(td.itertext())
+            for m in table.labels.finditer(txt):
+                key, conv = table.fields[m.group()]
+                obs[key] = conv(val)
+            txt = val
+    return obs, tree
+
+def parse_job(page, obs=None):
+    '''Extract job data from the job view page'''
+    obs, tree = parse_fields(page, _JOB_FIELDS, obs)
+    flat = _job_flat_xp(tree) if tree is not None else None
+    if flat:
+        obs['flatid']=int(flat[0].split('=')[-1][:-1])
+    return obs
+
+def parse_request(page, obs=None):
+    '''Extract request data from the request view page'''
+    obs, tree = parse_fields(page, _REQUEST_FIELDS, obs)
+    flat = _req_flat_xp(tree) if tree is not None else None
+    if flat:
+        obs['flatid']=int(flat[0].split('=')[1])
+    return obs
+
+def parse_epoch(t):
+    '''Unix time of the timestamp extracted from the page (None if missing or malformed)'''
+    try :
+        return calendar.timegm(time.strptime(' '.join(t[:4]), '%d %B %Y %H:%M:%S'))
+    except (TypeError, ValueError):
+        return None
+
+def parse_jid(page: str):
+    '''Extract the JobID from the `info` script variable of the request view page'''
+    m = _info_re.search(page)
+    if m is None:
+        return None
+    l = m.group(1)
+    return json.loads(l[l.find('{'):l.rfind('}')+1])['jid']
 
-# %% ../10_core.ipynb 14
+def parse_jid_list(page):
+    '''Extract the list of JobIDs from the job search results page'''
+    jlst=[]
+    tree = etree.HTML(page)
+    if tree is None:
+        return jlst
+    for a in _jid_links_xp(tree):
+        jid=a.rfind('jid')
+        if jid>0 :
+            jlst.append(int(a[jid+4:].split('&')[0]))
+    return jlst
+
+# %% ../10_core.ipynb 34
+@patch
+def _meta_refresh(self: Telescope, reqs):
+    '''
+    Invalidate cached requests which changed status according
+    to the list of requests from the request manager.
+    '''
+    if self.meta is None:
+        return
+    for rq in reqs:
+        self.meta.invalidate(('request', int(rq['id'])), 
+                             self.REQUESTSTATUS_TEXTS.get(int(rq['status'])))
+
+# %% ../10_core.ipynb 35
 @patch
 def get_user_requests(self: Telescope, 
                       folder: int =1,    # Id of the listed folder. Inbox=1.
@@ -170,9 +664,104 @@ def get_user_requests(self: Telescope,
 
     total=int(dat['data']['totalRequests'])
     res+=dat['data']['requests']
+    self._meta_refresh(res)
     return res
 
-# %% ../10_core.ipynb 16
+# %% ../10_core.ipynb 38
+@patch
+def iter_user_requests(self: Telescope, 
+                       folder: int =1,    # Id of the listed folder. Inbox=1.
+                       sort : str ='rid', # Name of the sorting colum: 'rid', 'object' or 'completion'
+                       page : int =100,   # Number of requests fetched in one call
+                      ):                  # Yields dictionaries representing the requests.
+    '''
+    Generate user requests from folder fetching them in pages of `page` rows.
+    '''
+    params={
+        'limit': page,
+        'sort': sort,
+        'folderid': folder}
+    row=0
+    while True:
+        dat = self.__do_rm_api("1-get-list-own", params)
+        reqs = dat['data']['requests']
+        self._meta_refresh(reqs)
+        yield from reqs
+        row += len(reqs)
+        if not reqs or row >= int(dat['data']['totalRequests']):
+            break
+        params['startAfterRow']=row
+
+# %% ../10_core.ipynb 39
+@patch
+def sync_user_requests(self: Telescope, 
+                       folder: int =1,    # Id of the listed folder. Inbox=1.
+                       page : int =100,   # Number of requests fetched in one call
+                       state : dict =None,# External sync state
+                       by : str ='rid',   # Sync on the request id ('rid') or completion time ('completion')
+                      ):                  # Yields new and changed requests
+    '''
+    Generate requests from the folder which are new or changed the status
+    since the last complete run. The state of the sync is stored
+    in the metadata cache and updated when the generator is exhausted.
+    The external `state` ({'top': highest seen rid, 'open': {rid: request}})
+    is used and updated in place instead of the stored one.
+    With `by='completion'` only the requests completed after the
+    latest completion time seen (`state['top']`) are generated.
+    The list carries no completion times, so they are read with
+    `get_request` - once per request, the final ones stay cached.
+    '''
+    if by not in ('rid', 'completion'):
+        raise ValueError(f'Unknown sync key: {by}')
+    store = None
+    if state is None:
+        store = self.meta.db if self.meta is not None else self.__dict__.setdefault('_sync', {})
+        state = store.get(('sync', folder, by)) or {'top': 0, 'open': {}}
+    top, pending = state['top'], dict(state['open'])
+    oldest = min(pending, default=top) if by == 'rid' else top
+    newtop, prev, desc = top, None, None
+    for rq in self.iter_user_requests(folder, sort=by, page=page):
+        if by == 'rid':
+            key = int(rq['id'])
+            if key > top or (key in pending and pending[key]['status'] != rq['status']):
+                yield rq
+            if self.is_final(rq['status']):
+                pending.pop(key, None)
+            else :
+                pending[key] = rq
+        else :
+            # Requests not completed yet have no completion time
+            if not self.is_final(rq['status']):
+                continue
+            key = parse_epoch(self.get_request(int(rq['id'])).get('completion'))
+            if key is None:
+                continue
+            if key > top:
+                yield rq
+        newtop = max(newtop, key)
+        if prev is not None and desc is not False:
+            # Trust the order only after seeing it descend
+            desc = key < prev
+        prev = key
+        if desc and key <= min(top, oldest):
+            break
+    if store is None:
+        state.update(top=newtop, open=pending)
+    else :
+        store[('sync', folder, by)] = {'top': newtop, 'open': pending}
+
+# %% ../10_core.ipynb 40
+@patch
+def open_requests(self: Telescope, folder: int =1):
+    '''
+    Requests from the folder which were not in the final state
+    during the last `sync_user_requests` run.
+    '''
+    store = self.meta.db if self.meta is not None else self.__dict__.setdefault('_sync', {})
+    state = store.get(('sync', folder, 'rid')) or {'open': {}}
+    return sorted(state['open'].values(), key=lambda r: int(r['id']), reverse=True)
+
+# %% ../10_core.ipynb 43
 @patch
 def get_jid_for_req(self:Telescope, req=None) -> int:
     '''
@@ -186,6 +775,7 @@ def get_jid_for_req(self:Telescope, req=None) -> int:
     ### Output
 
     JobID if the request is completed, otherwise False
+    The JobIDs of completed requests are cached.
     '''
     if req is not None:
         try: 
@@ -194,19 +784,20 @@ def get_jid_for_req(self:Telescope, req=None) -> int:
                 return None
         except TypeError:
             id = req
+
+    if self.meta is not None:
+        jid = self.meta.get(('jid', int(id)))
+        if jid is not None:
+            return jid
             
     rq = self.s.post(self.url+"v4request-view.php?" + f'rid={id}')
-    soup = BeautifulSoup(rq.text,'lxml')
-    
-    for blk in soup.find_all('script'):
-        if "var info = " in blk.text:
-            for l in  blk.text.split('\n'):
-                if "var info = " in l:
-                    l = l[l.find('{'):l.rfind('}')+1]
-                    return json.loads(l)['jid']
-    return None
+    jid = parse_jid(rq.text)
+    if jid and self.meta is not None:
+        # The job of the request never changes
+        self.meta.set(('jid', int(id)), jid, final=True)
+    return jid
 
-# %% ../10_core.ipynb 18
+# %% ../10_core.ipynb 45
 @patch
 def get_user_folders(self: Telescope):
     '''
@@ -214,9 +805,40 @@ def get_user_folders(self: Telescope):
     '''
     return self.__do_rm_api("0-get-my-folders")['data']
 
-# %% ../10_core.ipynb 20
+# %% ../10_core.ipynb 47
+@patch
+def _job_search(self: Telescope, start, end, filtertype='', camera=''):
+    '''
+    Run the job search for jobs completed between start and end
+    given as (day, month, year, hour, minute). Returns the response.
+    '''
+    try :
+        telescope=self.cameratypes[camera.lower()]
+    except KeyError:
+        telescope=''
+
+    d, m, y, hour, minute = start
+    de, me, ye, hourend, minuteend = end
+    searchdat = {
+        'sort1':'completetime',
+        'sort1order':'desc',
+        'searchearliestcom[]':[d, m, y, str(hour),str(minute)],
+        'searchlatestcom[]':  [de,me,ye,str(hourend),str(minuteend)],
+        'searchstatus[]':['1'],
+        'resultsperpage':str(self.SEARCH_PAGE),
+        'searchfilter':filtertype,
+        'searchtelescope':telescope,
+        'submit':'Go'
+    }
+
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+    return self.s.post(self.url+'v3job-search-query.php',
+                       data=searchdat, headers=headers)
+
+# %% ../10_core.ipynb 48
 @patch
-def get_obs_list(self: Telescope, t=None, dt=1, filtertype='', camera='', hour=16, minute=0, verb=False):
+def get_obs_list(self: Telescope, t=None, dt=1, filtertype='', camera='', hour=16, minute=0, verb=False, window=None):
     '''Get the dt days of observations taken no later then time in t.
 
         ### Input
@@ -226,6 +848,8 @@ def get_obs_list(self: Telescope, t=None, dt=1, filtertype='', camera='', hour=1
         dt - number of days, default to 1
         filtertype - filter by type of filter used
         camera - filter by the camera/telescope used
+        window - if given, the range is searched in windows of this
+            many days with `get_obs_range` (complete, parallel, cached)
 
         ### Output
         
@@ -252,31 +876,17 @@ def get_obs_list(self: Telescope, t=None, dt=1, filtertype='', camera='', hour=1
     log = logging.getLogger(__name__)
     log.debug('%d/%d/%d -> %d/%d/%d', d,m,y,de,me,ye)
 
-    try :
-        telescope=self.cameratypes[camera.lower()]
-    except KeyError:
-        telescope=''
-
-    searchdat = {
-        'sort1':'completetime',
-        'sort1order':'desc',
-        'searchearliestcom[]':[d, m, y, str(hour),str(minute)],
-        'searchlatestcom[]':  [de,me,ye,str(hour),str(minute)],
-        'searchstatus[]':['1'],
-        'resultsperpage':'1000',
-        'searchfilter':filtertype,
-        'searchtelescope':telescope,
-        'submit':'Go'
-    }
-
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-
+    if window is not None:
+        return self.get_obs_range(calendar.timegm((y, m, d, hour, minute, 0)),
+                                  calendar.timegm((ye, me, de, hour, minute, 0)),
+                                  window, filtertype, camera)
 
-    request = self.s.post(self.url+'v3job-search-query.php',
-                     data=searchdat, headers=headers)
-    soup = BeautifulSoup(request.text,'lxml')
+    request = self._job_search((d, m, y, hour, minute), (de, me, ye, hour, minute),
+                               filtertype, camera)
 
     if verb:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(request.text,'lxml')
         for h in soup.findAll('h3'):
             if 'Parameters' in h.text:
                 print('Params:')
@@ -289,22 +899,13 @@ def get_obs_list(self: Telescope, t=None, dt=1, filtertype='', camera='', hour=1
                     for l in h.find_next_sibling().get_text(strip=True, separator='\n').splitlines():
                         print(l)
     
-    jlst=[]
-    for l in soup.findAll('tr'):
-        try :
-            a=l.find('a').get('href')
-        except AttributeError :
-            continue
-        jid=a.rfind('jid')
-        if jid>0 :
-            jid=a[jid+4:].split('&')[0]
-            jlst.append(int(jid))
-    return jlst
+    return parse_jid_list(request.content)
 
-# %% ../10_core.ipynb 22
+# %% ../10_core.ipynb 50
 @patch
-def get_job(self: Telescope, jid=None):
-    '''Get a job data for a given JID'''
+def get_job(self: Telescope, jid=None, refresh=False):
+    '''Get a job data for a given JID.
+    The data is served from the metadata cache unless refresh is True.'''
 
     assert(jid is not None)
     assert(self.s is not None)
@@ -312,46 +913,29 @@ def get_job(self: Telescope, jid=None):
     log = logging.getLogger(__name__)
     log.debug(jid)
 
+    if self.meta is not None and not refresh:
+        obs = self.meta.get(('job', jid))
+        if obs is not None:
+            return obs
+
     obs={}
     obs['jid']=jid
     # rq=self.s.post(self.url+('v3cjob-view.php?jid=%d' % jid))
     rq=self.s.post(self.url+('v4request-view.php?jid=%d' % jid))
-    soup = BeautifulSoup(rq.text, 'lxml')
-    for l in soup.findAll('tr'):
-        log.debug(cleanup(l.text))
-        txt=''
-        for f in l.findAll('td'):
-            if txt.find('Request ID') >= 0:
-                obs['rid']=f.text[1:]            
-            if txt.find('Object Type') >= 0:
-                obs['type']=f.text
-            if txt.find('Object ID') >= 0:
-                obs['oid']=f.text
-            if txt.find('Telescope Type Name') >= 0:
-                obs['tele']=f.text
-            if txt.find('Filter Type') >= 0:
-                obs['filter']=f.text
-            if txt.find('Exposure Time') >= 0:
-                obs['exp']=f.text
-            if txt.find('Completion Time') >= 0:
-                t=f.text.split()
-                obs['completion']=t[3:6]+[t[6][1:]]+[t[7][:-1]]
-            if txt.find('Status') >= 0:
-                obs['status']= (f.text == 'Success')
-
-            txt=f.text
-    for l in soup.findAll('button'):
-        if l.get('onclick')is not None and ('dl-flat' in l.get('onclick')):
-            obs['flatid']=int(l.get('onclick').split('=')[-1][:-1])
-            break
+    parse_job(rq.content, obs)
     log.info('%(jid)d [%(tele)s, %(filter)s, %(status)s]: %(type)s %(oid)s %(exp)s', obs)
 
+    if self.meta is not None and 'tele' in obs:
+        # Jobs are created when the observation is completed - they are final
+        self.meta.set(('job', jid), obs, final=True)
     return obs
 
-# %% ../10_core.ipynb 25
+# %% ../10_core.ipynb 53
 @patch
-def get_request(self: Telescope, rid=None):
-    '''Get request data for a given RID'''
+def get_request(self: Telescope, rid=None, refresh=False):
+    '''Get request data for a given RID.
+    The data is served from the metadata cache unless refresh is True.
+    Requests in the final state are cached forever, others for `meta.ttl` seconds.'''
 
     assert(rid is not None)
     assert(self.s is not None)
@@ -359,52 +943,238 @@ def get_request(self: Telescope, rid=None):
     log = logging.getLogger(__name__)
     log.debug(rid)
 
+    if self.meta is not None and not refresh:
+        obs = self.meta.get(('request', rid))
+        if obs is not None:
+            return obs
+
     obs={}
     obs['rid']=rid
     #rq=self.s.post(self.url+('v3cjob-view.php?jid=%d' % jid))
     rq=self.s.post(self.url+('v4request-view.php?rid=%d' % rid))
-    soup = BeautifulSoup(rq.text, 'lxml')
-    for l in soup.findAll('tr'):
-        log.debug(cleanup(l.text))
-        txt=''
-        for f in l.findAll('td'):
-            if txt.find('Job ID') >= 0:
-                obs['jid']=f.text[1:]
-            if txt.find('Object Type') >= 0:
-                obs['type']=f.text
-            if txt.find('Object ID') >= 0:
-                obs['oid']=f.text
-            if txt.find('Object Name') >= 0:
-                obs['name']=f.text
-            if txt.find('Telescope Type Name') >= 0:
-                obs['tele_type']=f.text
-            if txt.find('Telescope Name') >= 0:
-                obs['tele']=f.text
-            if txt.find('Filter Type') >= 0:
-                obs['filter']=f.text
-            if txt.find('Dark Frame') >= 0:
-                obs['dark']=f.text
-            if txt.find('Exposure Time') >= 0:
-                obs['exp']=f.text
-            if txt.find('Request Time') >= 0:
-                t=f.text.split()
-                obs['requested']=t[3:6]+[t[6][1:]]+[t[7][:-1]]
-            if txt.find('Completion Time') >= 0:
-                t=f.text.split()
-                obs['completion']=t[3:6]+[t[6][1:]]+[t[7][:-1]]
-            if txt.find('Status') >= 0:
-                obs['status']= f.text.strip() #(f.text == 'Success')
-
-            txt=f.text
-    for l in soup.findAll('a'):
-        if l.get('href')is not None and ('dl-flat' in l.get('href')):
-            obs['flatid']=int(l.get('href').split('=')[1])
-            break
+    parse_request(rq.content, obs)
     log.info('%(jid)d [%(tele)s, %(filter)s, %(status)s]: %(type)s %(oid)s %(exp)s', obs)
 
+    if self.meta is not None and 'status' in obs:
+        self.meta.set(('request', rid), obs, final=self.is_final(obs['status']))
     return obs    
 
-# %% ../10_core.ipynb 27
+# %% ../10_core.ipynb 56
+class RateLimit:
+    '''
+    Thread-safe limiter of the rate of calls (per second).
+    The `None` or zero rate means no limit.
+    '''
+    def __init__(self, rate=None):
+        self.dt = 1/rate if rate else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.dt:
+            return
+        with self.lock:
+            now = time.monotonic()
+            t = max(now, self.next)
+            self.next = t + self.dt
+        if t > now:
+            time.sleep(t - now)
+
+# %% ../10_core.ipynb 57
+class BulkMapError(Exception):
+    '''
+    Some calls of the `bulk_map` failed. The `errors` 
+    attribute maps the failed keys to their exceptions.
+    '''
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} calls failed: ' + 
+                         ', '.join(f'{k}: {e!r}' for k, e in itertools.islice(errors.items(), 5)))
+
+def bulk_map(fn, keys, workers=8, rate=None, errors=None):
+    '''
+    Run `fn` for every key from `keys` in a pool of at most `workers` threads
+    and with at most `rate` calls per second. Yields the results as they
+    become available. The exceptions raised by `fn` are collected in 
+    the `errors` dictionary ({key: exception}) if it is given. Otherwise
+    `BulkMapError` with all of them is raised after all calls finish.
+    The keys are consumed lazily - at most 2*workers calls are in flight.
+    '''
+    log = logging.getLogger(__name__)
+    limit = RateLimit(rate)
+    failed = {} if errors is None else errors
+    
+    def call(k):
+        limit.wait()
+        return fn(k)
+    
+    keys = iter(keys)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = {}
+        while True:
+            for k in keys:
+                pending[ex.submit(call, k)] = k
+                if len(pending) >= 2*workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                k = pending.pop(f)
+                try :
+                    yield f.result()
+                except Exception as e:
+                    log.warning('Call for %s failed: %r', k, e)
+                    failed[k] = e
+    if errors is None and failed:
+        raise BulkMapError(failed)
+
+# %% ../10_core.ipynb 59
+@patch
+def get_jobs(self: Telescope, 
+             jids,              # Iterable of job IDs
+             workers=None,      # Max. number of concurrent calls (default: self.workers)
+             rate=None,         # Max. number of calls per second (default: self.rate)
+             errors=None,       # Dictionary collecting the failed calls (see `bulk_map`)
+            ):                  # Yields job dictionaries as returned by `get_job`
+    '''
+    Get job data for all JIDs in jids using concurrent calls.
+    The results are yielded in the order of completion.
+    Failed calls raise `BulkMapError` at the end unless
+    they are collected in the `errors` dictionary.
+    '''
+    return bulk_map(self.get_job, jids, 
+                    self.workers if workers is None else workers,
+                    self.rate if rate is None else rate, errors)
+
+# %% ../10_core.ipynb 60
+@patch
+def get_requests(self: Telescope, 
+                 rids,              # Iterable of request IDs
+                 workers=None,      # Max. number of concurrent calls (default: self.workers)
+                 rate=None,         # Max. number of calls per second (default: self.rate)
+                 errors=None,       # Dictionary collecting the failed calls (see `bulk_map`)
+                ):                  # Yields request dictionaries as returned by `get_request`
+    '''
+    Get request data for all RIDs in rids using concurrent calls.
+    The results are yielded in the order of completion.
+    Failed calls raise `BulkMapError` at the end unless
+    they are collected in the `errors` dictionary.
+    '''
+    return bulk_map(self.get_request, rids, 
+                    self.workers if workers is None else workers,
+                    self.rate if rate is None else rate, errors)
+
+# %% ../10_core.ipynb 66
+@patch
+def _obs_window(self: Telescope, st, et, filtertype='', camera=''):
+    '''
+    List of jobs completed between st and et (seconds from the epoch,
+    full minutes), newest first. Windows returning a full page are bisected.
+    Returns the list and the flag telling if it is complete.
+    '''
+    log = logging.getLogger(__name__)
+    key = ('obslist', st, et, filtertype, camera)
+    if self.meta is not None:
+        jids = self.meta.get(key)
+        if jids is not None:
+            return jids, True
+
+    def fields(t):
+        g = time.gmtime(t)
+        return (g.tm_mday, g.tm_mon, g.tm_year, g.tm_hour, g.tm_min)
+
+    jids = parse_jid_list(self._job_search(fields(st), fields(et), filtertype, camera).content)
+    complete = True
+    if len(jids) >= self.SEARCH_PAGE:
+        if et - st > 60:
+            mid = st + (et - st)//120*60
+            log.debug('Full page for %d-%d. Splitting at %d', st, et, mid)
+            late, cl = self._obs_window(mid, et, filtertype, camera)
+            early, ce = self._obs_window(st, mid, filtertype, camera)
+            jids, complete = late + early, cl and ce
+        else :
+            log.warning('More than %d jobs completed at %s', self.SEARCH_PAGE, time.ctime(st))
+            complete = False
+
+    # Truncated lists are never stored - the next search may do better
+    if complete and self.meta is not None and et < time.time() - time.timezone - 86400:
+        self.meta.set(key, jids, final=True)
+    return jids, complete
+
+# %% ../10_core.ipynb 67
+@patch
+def get_obs_range(self: Telescope, st, et=None, window=1, filtertype='', camera='', retries=2):
+    '''
+    Get the complete list of jobs completed between st and et
+    (seconds from the epoch, now by default). The range is searched
+    in windows of `window` days queried concurrently. Failed windows
+    are searched again up to `retries` times, then `BulkMapError` is raised.
+    Returns a list of JobIDs (int), newest first.
+    '''
+    log = logging.getLogger(__name__)
+    if et is None :
+        et=time.time()-time.timezone
+    st = int(st)//60*60
+    et = -(-int(et)//60)*60
+    step = max(60, int(window*86400)//60*60)
+    windows = [(max(st, t - step), t) for t in range(et, st, -step)]
+
+    found = {}
+    todo = windows
+    for n in range(retries+1):
+        errors = {}
+        found.update(bulk_map(lambda w: (w, self._obs_window(*w, filtertype, camera)[0]), 
+                              todo, self.workers, self.rate, errors))
+        todo = list(errors)
+        if not todo:
+            break
+        log.warning('Search of %d windows failed (%d)', len(todo), n)
+    else :
+        raise BulkMapError(errors)
+    # Windows share the end points - skip duplicates
+    jids = {}
+    for w in windows:
+        for jid in found[w]:
+            jids[jid] = None
+    return list(jids)
+
+# %% ../10_core.ipynb 71
+@patch
+def ie_create(self: Telescope, obs, cube=True):
+    '''
+    Start preparation of the observation in the image engine.
+    Returns the response of the engine.
+    '''
+    payload = {'jid': obs['jid']}
+    if 'flatid' in obs :
+        payload['flatid']=obs['flatid']
+    return self.__do_api_call("image-engine", 
+                              "0-create-dl" + ("3d" if cube else "zip"), payload)
+
+# %% ../10_core.ipynb 72
+@patch
+def ie_status(self: Telescope, ieid):
+    '''
+    Check the state of the image engine job.
+    '''
+    return self.__do_api_call("image-engine", "0-is-job-ready", {'ieid':ieid,})
+
+# %% ../10_core.ipynb 73
+@patch
+def ie_ready(self: Telescope, ieid, timeout=60, verbose=False) -> Future:
+    '''
+    Schedule waiting for the image engine job. Returns a future resolved
+    with the final response of the engine.
+    '''
+    def check():
+        rsp = self.ie_status(ieid)
+        if verbose:
+            print(f"{rsp['status']:30}", end='\n')
+        return rsp if rsp['status']=='READY' else None
+    return self.sched.submit(check, timeout=timeout)
+
+# %% ../10_core.ipynb 74
 @patch
 def download_obs(self: Telescope, obs=None, directory='.', cube=True, pbar=False, verbose=False):
     '''Download the raw observation obs (obtained from get_job) into zip
@@ -418,23 +1188,13 @@ def download_obs(self: Telescope, obs=None, directory='.', cube=True, pbar=False
     chunksize = 1024
     tq = None
 
-    payload = {'jid': obs['jid']}
-    if 'flatid' in obs :
-        payload['flatid']=obs['flatid']
-    
-    rsp = self.__do_api_call("image-engine", 
-                             "0-create-dl" + ("3d" if cube else "zip"), payload)
+    rsp = self.ie_create(obs, cube)
     ieid = rsp['data']['ieID']
 
-    n=0    
-    while rsp['status']!='READY' :
+    if rsp['status']!='READY' :
         if verbose:
             print(f"{rsp['status']:30}", end='\n')
-        time.sleep(2)
-        n+=1
-        rsp = self.__do_api_call("image-engine", "0-is-job-ready", {'ieid':ieid,})
-        if n>30:
-            raise TimeoutError
+        rsp = self.ie_ready(ieid, verbose=verbose).result()
     
     if verbose:
         print(f"{rsp['status']:30}")
@@ -447,6 +1207,7 @@ def download_obs(self: Telescope, obs=None, directory='.', cube=True, pbar=False
     fn = ('%(jid)d.' % obs) + ('fits' if cube else 'zip')
     siz = int(rsp['data']['fitssize' if cube else 'fitsbzsize'])
     if pbar :
+        from tqdm.auto import tqdm
         tq = tqdm(desc=fn,       
                   total=size,       
                   unit="B",       
@@ -454,7 +1215,8 @@ def download_obs(self: Telescope, obs=None, directory='.', cube=True, pbar=False
                   leave=True,       
                   miniters=1)
 
-    with open(os.path.join(directory, fn), 'wb') as fd:
+    fp = os.path.join(directory, fn)
+    with open(fp+'.part', 'wb') as fd:
         for chunk in rq.iter_content(chunksize):
             if chunk:
                 fd.write(chunk)
@@ -463,12 +1225,14 @@ def download_obs(self: Telescope, obs=None, directory='.', cube=True, pbar=False
     if tq :
         tq.close()
     sys.stdout.flush()
-    if siz==os.stat(os.path.join(directory, fn)).st_size :
+    if siz==os.stat(fp+'.part').st_size :
+        os.replace(fp+'.part', fp)
         return fn
     else:
+        os.remove(fp+'.part')
         return None
 
-# %% ../10_core.ipynb 29
+# %% ../10_core.ipynb 76
 @patch
 def get_obs(self: Telescope, obs=None, cube=True, recurse=True, pbar=False, verbose=False):
     '''Get the raw observation obs (obtained from get_job) into zip
@@ -481,11 +1245,15 @@ def get_obs(self: Telescope, obs=None, cube=True, recurse=True, pbar=False, verb
     log = logging.getLogger(__name__)
 
     fn = ('%(jid)d.' % obs) + ('fits' if cube else 'zip')
-    fp = path.join(self.cache,fn[0],fn[1],fn)
-    if not path.isfile(fp) :
+    fp = self.obscache.get(fn)
+    if fp is None :
+        fp = self.obscache.path(fn)
         log.info('Getting %s from server', fp)
         os.makedirs(path.dirname(fp), exist_ok=True)
-        self.download_obs(obs,path.dirname(fp),cube=cube,pbar=pbar,verbose=verbose)
+        if self.download_obs(obs,path.dirname(fp),cube=cube,pbar=pbar,verbose=verbose) is None:
+            log.warning('Incomplete download of %s', fn)
+            return self.get_obs(obs, cube, False, pbar, verbose) if recurse else None
+        self.obscache.put(fn)
     else :
         log.info('Getting %s from cache', fp)
     content = open(fp,'rb')
@@ -494,14 +1262,87 @@ def get_obs(self: Telescope, obs=None, cube=True, recurse=True, pbar=False, verb
     except BadZipFile :
         # Probably corrupted download. Try again once.
         content.close()
-        os.remove(fp)
+        self.obscache.remove(fn)
         if recurse :
             return self.get_obs(obs, cube, False)
         else :
             return None
 
 
-# %% ../10_core.ipynb 32
+# %% ../10_core.ipynb 81
+@patch
+def get_layers(self: Telescope, obs=None, layers=None, pbar=False, verbose=False):
+    '''
+    Return the list of lazily loaded, memory mapped HDUs of the 
+    observation layers. The `layers` sequence selects the layers 
+    by index (all layers by default).
+    '''
+    from astropy.io import fits
+
+    assert(obs is not None)
+    log = logging.getLogger(__name__)
+    key = ('layers', obs['jid'])
+    names = None if self.meta is None else self.meta.get(key)
+    z = None
+    if names is None:
+        z = self.get_obs(obs, cube=False, pbar=pbar, verbose=verbose)
+        if z is None:
+            return None
+        names = z.namelist()
+        if self.meta is not None:
+            self.meta.set(key, names, True)
+    if layers is not None:
+        names = [names[n] for n in layers]
+    hdul = []
+    for name in names:
+        fn = '%d_%s' % (obs['jid'], path.basename(name))
+        fp = self.obscache.get(fn)
+        if fp is None:
+            if z is None:
+                z = self.get_obs(obs, cube=False, pbar=pbar, verbose=verbose)
+            fp = self.obscache.path(fn)
+            log.info('Unpacking %s', fp)
+            os.makedirs(path.dirname(fp), exist_ok=True)
+            with z.open(name) as src, open(fp + '.part', 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1<<20)
+            os.replace(fp + '.part', fp)
+            self.obscache.put(fn)
+        hdul.append(fits.open(fp, memmap=True, lazy_load_hdus=True)[0])
+    if z is not None:
+        z.close()
+    return hdul
+
+# %% ../10_core.ipynb 84
+@patch
+def _processed_src(self: Telescope, obs, cube=False):
+    '''
+    Check if the processed observation is ready.
+    Returns the download link or None.
+    '''
+    rq=self.s.get(self.url+
+                  ('imageengine-request.php?jid=%d&type=%d' %
+                    (obs['jid'], 1 if cube else 3 )))
+    tree=etree.HTML(rq.content)
+    dlif=None if tree is None else tree.find('.//iframe')
+    return None if dlif is None else dlif.get('src')
+
+# %% ../10_core.ipynb 85
+@patch
+def _processed_rq(self: Telescope, obs, cube=False):
+    '''
+    Wait for the processed observation and start its download.
+    Returns the streamed response or None if the data is not ready in time.
+    '''
+    log = logging.getLogger(__name__)
+    try :
+        dl=self.sched.submit(lambda: self._processed_src(obs, cube), 
+                             timeout=self.tout, first=0).result()
+    except TimeoutError :
+        log.warning('No data after %ds', self.tout)
+        return None
+    return self.s.get(self.url+dl,stream=True)
+
+# %% ../10_core.ipynb 86
 @patch
 def download_obs_processed(self: Telescope, obs=None, directory='.', cube=False, pbar=False):
     '''Download the raw observation obs (obtained from get_job) into zip
@@ -512,94 +1353,97 @@ def download_obs_processed(self: Telescope, obs=None, directory='.', cube=False,
     assert(obs is not None)
     assert(self.s is not None)
 
-    log = logging.getLogger(__name__)
-
     fn=None
 
-    tout=self.tout
     tq = None
-    chunksize = 1024
+    chunksize = 1<<16
  
-    while tout > 0 :
-        rq=self.s.get(self.url+
-                      ('imageengine-request.php?jid=%d&type=%d' %
-                        (obs['jid'], 1 if cube else 3 )))
+    rq=self._processed_rq(obs, cube)
+    if rq is None:
+        return None
+    size = int(rq.headers.get('Content-Length', 0))
+    fn = ('art_%(jid)d.' % obs) + ('fits' if cube else 'zip')
 
-        soup = BeautifulSoup(rq.text, 'lxml')
-        dlif=soup.find('iframe')
+    if pbar :
+        from tqdm.auto import tqdm
+        tq = tqdm(desc=fn,       
+                  total=size,       
+                  unit="B",       
+                  unit_scale=True,        
+                  leave=True,       
+                  miniters=1)
 
-        try :
-            dl=dlif.get('src')
-            rq=self.s.get(self.url+dl,stream=True)
-            size = int(rq.headers.get('Content-Length', 0))
-            fn = ('art_%(jid)d.' % obs) + ('fits' if cube else 'zip')
-
-            if pbar :
-                tq = tqdm(desc=fn,       
-                          total=size,       
-                          unit="B",       
-                          unit_scale=True,        
-                          leave=True,       
-                          miniters=1)
-
-            with open(path.join(directory, fn), 'wb') as fd:
-                for chunk in rq.iter_content(chunksize):
-                    fd.write(chunk)
-                    if tq :
-                        tq.update(len(chunk))
-                    
-            if tq: 
-                tq.close()
-            return fn
-        except AttributeError :
-            tout-=self.retry
-            log.warning('No data. Sleep for %ds ...'%self.retry)
-            time.sleep(self.retry)
-
-    return None
+    fp = path.join(directory, fn)
+    with open(fp+'.part', 'wb') as fd:
+        for chunk in rq.iter_content(chunksize):
+            fd.write(chunk)
+            if tq :
+                tq.update(len(chunk))
+    os.replace(fp+'.part', fp)
+            
+    if tq: 
+        tq.close()
+    return fn
 
 
 
-# %% ../10_core.ipynb 34
+# %% ../10_core.ipynb 88
 @patch
-def get_obs_processed(self: Telescope, obs=None, cube=False):
-    '''Get the raw observation obs (obtained from get_job) into zip
+def get_obs_processed(self: Telescope, obs=None, cube=False, cache=True, recurse=True):
+    '''Get the processed observation obs (obtained from get_job) into
     file-like object. The function returns ZipFile structure of the
-    downloaded data.'''
+    downloaded data (or the FITS file if cube is True). 
+    The data are stored in the cache directory as `art_jid.zip/fits`.
+    Without cache the data are streamed into a temporary file
+    kept in memory only up to `self.spool` bytes.'''
 
     assert(obs is not None)
     assert(self.s is not None)
     log = logging.getLogger(__name__)
 
-    tout=self.tout
-       
-    while tout > 0 :
-        rq=self.s.get(self.url+
-                      ('imageengine-request.php?jid=%d&type=%d' %
-                        (obs['jid'], 1 if cube else 3 )))
-
-        soup = BeautifulSoup(rq.text,'lxml')
-        dlif=soup.find('iframe')
-        try :
-            dl=dlif.get('src')
-            rq=self.s.get(self.url+dl,stream=True)
-            return BytesIO(rq.content) if cube else ZipFile(BytesIO(rq.content))
-
-        except AttributeError :
-            tout-=self.retry
-            log.warning('No data. Sleep for %ds ...'%self.retry)
-            time.sleep(self.retry)
-
-    return None
+    fp = None
+    if cache and self.obscache is not None:
+        fn = ('art_%(jid)d.' % obs) + ('fits' if cube else 'zip')
+        fp = self.obscache.get(fn)
+        if fp is None :
+            fp = self.obscache.path(fn)
+            log.info('Getting %s from server', fp)
+            os.makedirs(path.dirname(fp), exist_ok=True)
+            if self.download_obs_processed(obs,path.dirname(fp),cube=cube) is None:
+                return None
+            self.obscache.put(fn)
+        else :
+            log.info('Getting %s from cache', fp)
+        content = open(fp,'rb')
+    else :
+        rq=self._processed_rq(obs, cube)
+        if rq is None:
+            return None
+        content = SpooledTemporaryFile(max_size=self.spool)
+        for chunk in rq.iter_content(1<<16):
+            content.write(chunk)
+        content.seek(0)
+    try :
+        return content if cube else ZipFile(content)
+    except BadZipFile :
+        # Probably corrupted download. Try again once.
+        content.close()
+        if fp is not None:
+            self.obscache.remove(fn)
+        if recurse :
+            return self.get_obs_processed(obs, cube, cache, False)
+        else :
+            return None
 
 
-# %% ../10_core.ipynb 38
+# %% ../10_core.ipynb 93
 @patch
-def submit_job_api(self: Telescope, obj, exposure=30000, tele='COAST',
-                    filt='BVR', darkframe=True,
-                    name='RaDec object', comment='AutoSubmit'):
-    assert(self.s is not None)
-
+def _rc_params(self: Telescope, obj, exposure=30000, tele='COAST',
+               filt='BVR', darkframe=True,
+               name='RaDec object', comment='AutoSubmit'):
+    '''
+    Request constructor parameters of the RADEC request.
+    '''
     log = logging.getLogger(__name__)
 
     ra=obj.ra.to_string(unit='hour', sep=':', pad=True, precision=2,
@@ -627,13 +1471,24 @@ def submit_job_api(self: Telescope, obj, exposure=30000, tele='COAST',
               'exposuretime': exposure, 'filtertype': filt,
               'objecttype': 'RADEC', 'objectname': name,
               'objectid': ra+' '+dec, 'usercomments': comment }
+    return params
+
+#| exporti
+@patch
+def _rc_submit(self: Telescope, params, s=None):
+    '''
+    Submit the request through the request basket of the session s.
+    The basket is kept in the server-side state of the session,
+    thus concurrent submissions need separate sessions.
+    '''
+    log = logging.getLogger(__name__)
 
-    self.__do_rc_api("0-rb-clear")
+    self.__do_rc_api("0-rb-clear", s=s)
 
-    r = self.__do_rc_api("0-rb-set", params)
+    r = self.__do_rc_api("0-rb-set", params, s=s)
     log.debug('Req data:%s', r)
     if r['success'] :
-        r = self.__do_rc_api("0-rb-submit")
+        r = self.__do_rc_api("0-rb-submit", s=s)
         log.debug('Submission data:%s', r)
     if r['success'] :
         return True, r['data']['id']
@@ -641,7 +1496,15 @@ def submit_job_api(self: Telescope, obj, exposure=30000, tele='COAST',
         log.warning('Submission error. Status:%s', r['status'])
         return False, r['status']
 
-# %% ../10_core.ipynb 39
+#| export
+@patch
+def submit_job_api(self: Telescope, obj, exposure=30000, tele='COAST',
+                    filt='BVR', darkframe=True,
+                    name='RaDec object', comment='AutoSubmit'):
+    assert(self.s is not None)
+    return self._rc_submit(self._rc_params(obj, exposure, tele, filt, darkframe, name, comment))
+
+# %% ../10_core.ipynb 94
 @patch
 def submit_RADEC_job(self: Telescope, obj, exposure=30000, tele='COAST',
                     filt='BVR', darkframe=True,
@@ -718,3 +1581,70 @@ def submit_RADEC_job(self: Telescope, obj, exposure=30000, tele='COAST',
     log.debug('Submit (ticket %s)', t)
     r=self.s.post(u,data={'ticket':t, 'action':'main-submit'})
     return r
+
+# %% ../10_core.ipynb 96
+def _transient(e):
+    '''
+    True for the network errors and server responses worth retrying.
+    '''
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and (e.response.status_code >= 500 or e.response.status_code == 429)
+    return isinstance(e, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+@patch
+def submit_batch(self: Telescope, 
+                 targets,           # Iterable of dicts with `submit_job_api` arguments
+                 workers=4,         # Number of concurrent submissions
+                 retries=2,         # Number of retries of failed calls
+                 resolve=None,      # Function resolving target name into coordinates
+                 dedupe=True,       # Skip targets already in the queue
+                 dry_run=False,     # Only check the targets against the queue
+                ):
+    '''
+    Submit many targets concurrently. Returns a dictionary of 
+    `(success, id or status)` results keyed by target name. 
+    Targets found in the queue get `(None, rid)` of the queued request.
+    '''
+    log = logging.getLogger(__name__)
+    results = {}
+    if dedupe:
+        for _ in self.sync_user_requests():
+            pass
+        for rq in self.open_requests():
+            if int(rq['status']) < 8:
+                results.setdefault(rq['objectname'], (None, rq['id']))
+    todo = []
+    for t in targets:
+        if t['name'] in results or any(t['name'] == o['name'] for o in todo):
+            log.info('%s already queued', t['name'])
+            continue
+        todo.append(t)
+    results = {t['name']: results[t['name']] for t in targets if t['name'] in results}
+    if dry_run or not todo:
+        return results
+
+    local = threading.local()
+
+    def submit(t):
+        t = dict(t)
+        for n in range(retries+1):
+            try :
+                if 'obj' not in t:
+                    t['obj'] = resolve(t['name'])
+                if getattr(local, 's', None) is None:
+                    local.s = self._login_session()
+                return t['name'], self._rc_submit(self._rc_params(**t), local.s)
+            except Exception as e:
+                if not _transient(e) or n == retries:
+                    log.warning('Submission of %s failed: %r', t['name'], e)
+                    return t['name'], (False, repr(e))
+                log.warning('Submission of %s failed (%d), retrying: %r', t['name'], n, e)
+                req = getattr(e, 'request', None)
+                self.metrics.retry(endpoint_name(req) if req is not None else 'api-user.php')
+                local.s = None
+                time.sleep(n)
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for name, res in ex.map(submit, todo):
+            results[name] = res
+    return results
@@ -0,0 +1,191 @@
+"""Parallel, resumable download of many observations from the image engine."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../12_download.ipynb.
+
+# %% ../12_download.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['DownloadManager']
+
+# %% ../12_download.ipynb 4
+import os
+import logging
+from fastcore.basics import patch
+from queue import Queue
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from ouscope.core import Telescope, bulk_map
+
+# %% ../12_download.ipynb 6
+def fetch(s, url, fp, size=0, chunksize=1<<20, timeout=60, tq=None):
+    '''
+    Download url with session s into the file fp resuming the partial
+    download left in fp.part. If size is not given the Content-Length
+    of the response is used. Returns True if the file is complete.
+    '''
+    part = fp + '.part'
+    have = os.path.getsize(part) if os.path.isfile(part) else 0
+    if size and have > size:
+        have = 0
+    headers = {'Range': f'bytes={have}-'} if have else {}
+    with s.get(url, headers=headers, stream=True, timeout=timeout) as rq:
+        if rq.status_code == 416 :
+            # Nothing left to download
+            expected = size or have
+        else :
+            rq.raise_for_status()
+            if rq.status_code != 206 :
+                # Server ignored the range - start over
+                have = 0
+            expected = size or have + int(rq.headers.get('Content-Length', 0))
+            if tq is not None:
+                tq.update(have)
+            with open(part, 'r+b' if have else 'wb', buffering=chunksize) as fd:
+                fd.seek(have)
+                fd.truncate()
+                for chunk in rq.iter_content(chunksize):
+                    fd.write(chunk)
+                    if tq is not None:
+                        tq.update(len(chunk))
+    if os.path.getsize(part) == expected :
+        os.replace(part, fp)
+        return True
+    return False
+
+# %% ../12_download.ipynb 9
+class DownloadManager:
+    '''
+    Parallel, resumable download of many observations.
+    '''
+    def __init__(self, scope: Telescope, directory=None, cube=True, 
+                 workers=4, prepare_workers=None, chunksize=1<<20, retries=3, tout=60):
+        self.scope = scope
+        self.directory = directory
+        self.cube = cube
+        self.workers = workers
+        self.prepare_workers = scope.workers if prepare_workers is None else prepare_workers
+        self.chunksize = chunksize
+        self.retries = retries
+        self.tout = tout
+        self.queue = []
+
+# %% ../12_download.ipynb 10
+@patch
+def add(self: DownloadManager, obs, fn=None):
+    '''
+    Queue the observation for download into the file fn
+    (`jid.fits` or `jid.zip` in the directory or in the cache by default).
+    '''
+    if fn is None:
+        name = ('%(jid)d.' % obs) + ('fits' if self.cube else 'zip')
+        if self.directory is None:
+            fn = self.scope.obscache.get(name) or self.scope.obscache.path(name)
+        else :
+            fn = os.path.join(self.directory, name)
+    self.queue.append((obs, fn))
+
+# %% ../12_download.ipynb 11
+@patch
+def _prepare(self: DownloadManager, item):
+    '''
+    Start preparation of the observation in the image engine.
+    Returns the item with the ieid and the response of the engine.
+    '''
+    log = logging.getLogger(__name__)
+    obs, fn = item
+    try :
+        rsp = self.scope.ie_create(obs, self.cube)
+        return obs, fn, rsp['data']['ieID'], rsp
+    except Exception as e:
+        log.warning('Preparation of %d failed: %r', obs['jid'], e)
+        return obs, fn, None, None
+
+# %% ../12_download.ipynb 12
+@patch
+def _download(self: DownloadManager, item, tq=None):
+    '''
+    Stream the prepared observation into its file.
+    Returns the observation and the file name (None on failure).
+    '''
+    log = logging.getLogger(__name__)
+    obs, fn, ieid, size = item
+    if ieid is None:
+        return obs, None
+    url = self.scope.url+f'v3image-download.php?jid={obs["jid"]}&ieid={ieid}'
+    os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+    for n in range(self.retries+1):
+        if n:
+            self.scope.metrics.retry('v3image-download.php')
+        try :
+            if fetch(self.scope.s, url, fn, size, self.chunksize, self.scope.tout, tq):
+                if self.directory is None:
+                    self.scope.obscache.put(os.path.basename(fn))
+                return obs, fn
+            log.warning('Incomplete download of %s', fn)
+        except Exception as e:
+            log.warning('Download of %s failed: %r', fn, e)
+    return obs, None
+
+# %% ../12_download.ipynb 13
+@patch
+def run(self: DownloadManager, pbar=False):
+    '''
+    Download all queued observations. Yields tuples (obs, file name)
+    as the downloads finish. The file name is None for failed downloads.
+    '''
+    log = logging.getLogger(__name__)
+    todo = []
+    for obs, fn in self.queue:
+        if os.path.isfile(fn):
+            yield obs, fn
+        else :
+            todo.append((obs, fn))
+    self.queue = []
+    if not todo:
+        return
+    tq = None
+    if pbar:
+        from tqdm.auto import tqdm
+        tq = tqdm(desc='Download', unit="B", unit_scale=True, leave=True)
+    done = Queue()
+    size_key = 'fitssize' if self.cube else 'fitsbzsize'
+
+    with ThreadPoolExecutor(max_workers=self.workers) as pool:
+        def download(obs, fn, ieid, rsp):
+            try :
+                size = int(rsp['data'][size_key]) if ieid is not None else 0
+                done.put(self._download((obs, fn, ieid, size), tq))
+            except Exception as e:
+                log.warning('Download of %d failed: %r', obs['jid'], e)
+                done.put((obs, None))
+
+        def ready(obs, fn, ieid, fut):
+            try :
+                pool.submit(download, obs, fn, ieid, fut.result())
+            except Exception as e:
+                log.warning('Preparation of %d failed: %r', obs['jid'], e)
+                done.put((obs, None))
+
+        for obs, fn, ieid, rsp in bulk_map(self._prepare, todo, self.prepare_workers):
+            if ieid is None or rsp['status']=='READY':
+                pool.submit(download, obs, fn, ieid, rsp)
+            else :
+                self.scope.ie_ready(ieid, timeout=self.tout).add_done_callback(partial(ready, obs, fn, ieid))
+        for _ in todo:
+            yield done.get()
+    if tq is not None:
+        tq.close()
+
+# %% ../12_download.ipynb 14
+@patch
+def download_many(self: Telescope, obslist, directory=None, cube=True, workers=4, pbar=False):
+    '''
+    Download all observations from obslist into the directory
+    (the observation cache by default).
+    Yields tuples (obs, file name) as the downloads finish.
+    '''
+    dm = DownloadManager(self, directory, cube, workers)
+    for obs in obslist:
+        dm.add(obs)
+    return dm.run(pbar=pbar)
@@ -0,0 +1,343 @@
+"""Local stand-in of the telescope.org site for tests and benchmarks."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../13_fakeserver.ipynb.
+
+# %% ../13_fakeserver.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['FakeTelescope']
+
+# %% ../13_fakeserver.ipynb 4
+import os
+import re
+import io
+import json
+import time
+import calendar
+import zipfile
+import itertools
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, parse_qs
+import ouscope
+from fastcore.basics import patch
+
+# %% ../13_fakeserver.ipynb 6
+def default_fixtures():
+    '''
+    The `fixtures` directory installed with the package.
+    '''
+    return os.path.join(os.path.dirname(os.path.abspath(ouscope.__file__)), 'fixtures')
+
+# %% ../13_fakeserver.ipynb 7
+class FakeTelescope:
+    '''
+    Local stand-in of the telescope.org site. It serves `n` synthetic
+    requests (most of them complete, with jobs) using the recorded page
+    templates from the `fixtures` directory and synthetic FITS observations 
+    of the given `shape`. Every response is delayed by `latency` seconds.
+    The image engine reports the observation ready after `ready_polls` polls.
+    '''
+    def __init__(self, n=100, latency=0.0, shape=(256, 256), ready_polls=1, 
+                 fixtures=None, port=0):
+        self.n = n
+        self.latency = latency
+        self.shape = shape
+        self.ready_polls = ready_polls
+        self.port = port
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        # Number of calls in progress and its maximum
+        self.active = self.peak = 0
+        self.baskets = {}
+        self.ie = {}
+        self.payloads = {}
+        self.ids = itertools.count(1)
+        self.server = None
+        self._load_templates(default_fixtures() if fixtures is None else fixtures)
+        # Requests numbered from rid0, newest first. Every 10th is still open.
+        self.rid0, self.jid0 = 800000, 500000
+        self.start = calendar.timegm((2024, 1, 1, 0, 0, 0))
+        self.requests = {}
+        for i in range(n):
+            rid = self.rid0 + i
+            self.requests[rid] = {'id': str(rid), 'status': '3' if i % 10 == 9 else '8',
+                                  'objectname': f'V{i} Cyg',
+                                  'requesttime': str(self.start + 600*i - 86400),
+                                  'jid': 0 if i % 10 == 9 else self.jid0 + i}
+        self.jobs = {rq['jid']: (rid, self.start + 600*(rid - self.rid0)) 
+                     for rid, rq in self.requests.items() if rq['jid']}
+        self.end = self.start + 600*n
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+    @property
+    def jids(self):
+        return sorted(self.jobs, reverse=True)
+
+    def start_server(self):
+        '''
+        Start serving in the background thread.
+        '''
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), _FakeHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start_server()
+
+    def __exit__(self, *args):
+        self.stop_server()
+
+# %% ../13_fakeserver.ipynb 8
+_ago = re.compile(r'<td>[^<]* ago: [^<]*</td>')
+
+def _when(t):
+    return time.strftime('<td>1 day ago: %d %B %Y (%H:%M:%S UTC)</td>', time.gmtime(t))
+
+@patch
+def _load_templates(self: FakeTelescope, fixtures):
+    '''
+    Turn the recorded pages into templates with `@@NAME@@` placeholders.
+    '''
+    def read(name):
+        with open(os.path.join(fixtures, name)) as f:
+            return f.read()
+    job = read('v4request-view-jid.html')
+    job = job.replace(' <a href="v4request-view.php?rid=771970">R771970</a>', '')
+    job = job.replace('423183', '@@JID@@').replace('771716', '@@RID@@')
+    # The first time in the page is the completion time
+    self.job_tpl = _ago.sub('@@COMPLETED@@', job)
+    req = read('v4request-view-rid.html')
+    req = req.replace('771144', '@@RID@@').replace('422672', '@@JID@@').replace('LX Cyg', '@@NAME@@')
+    req = req.replace('<td> Complete </td>', '<td> @@STATUS@@ </td>').replace('"status":8', '"status":@@CODE@@')
+    req = _ago.sub('@@REQUESTED@@', req, count=1)
+    self.req_tpl = _ago.sub('@@COMPLETED@@', req, count=1)
+    search = read('v3job-search-query.html')
+    start = search.index('<tr>\n<td><a href="v4request-view.php?jid=')
+    end = search.index('</tr>', start) + len('</tr>\n')
+    row = search[start:end]
+    self.search_head = re.sub(r'<p>\d+ jobs</p>', '<p>@@COUNT@@ jobs</p>', search[:start])
+    self.search_row = row.replace(re.search(r'jid=(\d+)', row).group(1), '@@JID@@')
+    self.search_tail = search[search.index('</table>'):]
+
+def _fill(tpl, **kw):
+    for k, v in kw.items():
+        tpl = tpl.replace(f'@@{k}@@', str(v))
+    return tpl
+
+# %% ../13_fakeserver.ipynb 9
+@patch
+def job_page(self: FakeTelescope, jid):
+    if jid not in self.jobs:
+        return self.search_head.replace('@@COUNT@@', '0') + self.search_tail
+    rid, t = self.jobs[jid]
+    return _fill(self.job_tpl, JID=jid, RID=rid, COMPLETED=_when(t))
+
+@patch
+def request_page(self: FakeTelescope, rid):
+    rq = self.requests.get(rid)
+    if rq is None:
+        return self.search_head.replace('@@COUNT@@', '0') + self.search_tail
+    status = {'8': 'Complete', '3': 'Waiting'}[rq['status']]
+    return _fill(self.req_tpl, RID=rid, JID=rq['jid'], NAME=rq['objectname'], STATUS=status, CODE=rq['status'],
+                 REQUESTED=_when(int(rq['requesttime'])), 
+                 COMPLETED=_when(self.jobs[rq['jid']][1]) if rq['jid'] else '<td></td>')
+
+@patch
+def search_page(self: FakeTelescope, q):
+    def sec(name):
+        d, m, y, H, M = (int(v) for v in q[name])
+        return calendar.timegm((y, m, d, H, M, 0))
+    st, et = sec('searchearliestcom[]'), sec('searchlatestcom[]')
+    jids = [jid for jid in self.jids if st <= self.jobs[jid][1] <= et][:int(q['resultsperpage'][0])]
+    return (self.search_head.replace('@@COUNT@@', str(len(jids))) + 
+            ''.join(self.search_row.replace('@@JID@@', str(jid)) for jid in jids) + 
+            self.search_tail)
+
+# %% ../13_fakeserver.ipynb 10
+@patch
+def payload(self: FakeTelescope, jid, cube=True):
+    '''
+    Synthetic observation: a FITS cube or a zip of the B, V, R FITS layers
+    with noise and a few gaussian stars.
+    '''
+    with self.lock:
+        if (jid, cube) in self.payloads:
+            return self.payloads[jid, cube]
+    import numpy as np
+    from astropy.io import fits
+
+    rng = np.random.default_rng(jid)
+    h, w = self.shape
+    y, x = np.mgrid[:h, :w]
+    img = rng.normal(1000, 10, (3, h, w))
+    for sx, sy, f in zip(rng.uniform(0, w, 20), rng.uniform(0, h, 20), rng.uniform(500, 5000, 20)):
+        img += f*np.exp(-((x-sx)**2 + (y-sy)**2)/4)
+    img = img.astype(np.int16)
+    buf = io.BytesIO()
+    if cube:
+        hdu = fits.PrimaryHDU(img)
+        hdu.header['JOBID'] = jid
+        hdu.writeto(buf)
+    else :
+        with zipfile.ZipFile(buf, 'w') as z:
+            for layer, f in zip(img, 'BVR'):
+                hdu = fits.PrimaryHDU(layer)
+                hdu.header['JOBID'] = jid
+                hdu.header['FILTER'] = f
+                fb = io.BytesIO()
+                hdu.writeto(fb)
+                z.writestr(f'J{jid}_{f}.fits', fb.getvalue())
+    data = buf.getvalue()
+    with self.lock:
+        self.payloads[jid, cube] = data
+    return data
+
+# %% ../13_fakeserver.ipynb 11
+@patch
+def api(self: FakeTelescope, sid, module, req, params):
+    '''
+    The `api-user.php` call. Returns the response dictionary.
+    '''
+    if module == 'request-manager':
+        if req == '0-get-my-folders':
+            return {'success': True, 'data': [{'id': 1, 'name': 'Inbox'}]}
+        if req == '1-get-list-own':
+            rows = sorted(self.requests.values(), key=lambda r: int(r['id']), reverse=True)
+            start = int(params.get('startAfterRow', 0))
+            rows = [{k: v for k, v in r.items() if k != 'jid'} 
+                    for r in rows[start:start + int(params.get('limit', 100))]]
+            return {'success': True, 'data': {'totalRequests': len(self.requests), 'requests': rows}}
+    elif module == 'request-constructor':
+        with self.lock:
+            if req == '0-rb-clear':
+                self.baskets[sid] = None
+                return {'success': True}
+            if req == '0-rb-set':
+                self.baskets[sid] = params
+                return {'success': True}
+            if req == '0-rb-submit':
+                basket = self.baskets.pop(sid, None)
+                if not basket:
+                    return {'success': False, 'status': 'Empty basket'}
+                rid = self.rid0 + len(self.requests)
+                self.requests[rid] = {'id': str(rid), 'status': '1', 'objectname': basket['objectname'],
+                                      'requesttime': str(int(time.time())), 'jid': 0}
+                return {'success': True, 'data': {'id': rid}}
+    elif module == 'image-engine':
+        if req.startswith('0-create-dl'):
+            jid = int(params['jid'])
+            if jid not in self.jobs:
+                return {'success': False, 'status': 'NO JOB'}
+            ieid = next(self.ids)
+            with self.lock:
+                self.ie[ieid] = [jid, req.endswith('3d'), 0]
+            return self._ie_status(ieid)
+        if req == '0-is-job-ready':
+            ieid = int(params['ieid'])
+            with self.lock:
+                self.ie[ieid][2] += 1
+            return self._ie_status(ieid)
+    return {'success': False, 'status': f'Unknown call {module}/{req}'}
+
+@patch
+def _ie_status(self: FakeTelescope, ieid):
+    jid, cube, polls = self.ie[ieid]
+    if polls < self.ready_polls:
+        return {'success': True, 'status': 'PROCESSING', 'data': {'ieID': ieid}}
+    size = len(self.payload(jid, cube))
+    return {'success': True, 'status': 'READY', 
+            'data': {'ieID': ieid, 'fitssize': size, 'fitsbzsize': size}}
+
+# %% ../13_fakeserver.ipynb 12
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go in separate writes - avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_call()
+
+    def do_POST(self):
+        self.handle_call()
+
+    def send(self, body, ctype='text/html', code=200, headers={}):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def handle_call(self):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        page = url.path.rsplit('/', 1)[-1]
+        q = parse_qs(url.query)
+        n = int(self.headers.get('Content-Length') or 0)
+        if n:
+            q.update(parse_qs(self.rfile.read(n).decode()))
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        sid = cookie['PHPSESSID'].value if 'PHPSESSID' in cookie else None
+        with fake.lock:
+            fake.hits[page] += 1
+            fake.active += 1
+            fake.peak = max(fake.peak, fake.active)
+        try :
+            self.respond(fake, page, q, sid)
+        finally :
+            with fake.lock:
+                fake.active -= 1
+
+    def respond(self, fake, page, q, sid):
+        if fake.latency:
+            time.sleep(fake.latency)
+        if page == 'login.php':
+            self.send('OK', headers={'Set-Cookie': 'PHPSESSID=%d; Path=/' % next(fake.ids)})
+        elif page == 'logout.php':
+            self.send('OK')
+        elif page == 'api-user.php':
+            params = json.loads(q['params'][0]) if q.get('params', ['{}'])[0] != '{}' else {}
+            self.send(json.dumps(fake.api(sid, q['module'][0], q['request'][0], params)), 'application/json')
+        elif page == 'v4request-view.php':
+            if 'jid' in q:
+                self.send(fake.job_page(int(q['jid'][0])))
+            else :
+                self.send(fake.request_page(int(q['rid'][0])))
+        elif page == 'v3job-search-query.php':
+            self.send(fake.search_page(q))
+        elif page == 'v3image-download.php' and int(q['ieid'][0]) in fake.ie:
+            jid, cube, _ = fake.ie[int(q['ieid'][0])]
+            data = fake.payload(jid, cube)
+            rng = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+            if rng is None:
+                self.send(data, 'application/octet-stream')
+            elif int(rng.group(1)) >= len(data):
+                self.send(b'', code=416)
+            else :
+                start = int(rng.group(1))
+                self.send(data[start:], 'application/octet-stream', 206, 
+                          {'Content-Range': f'bytes {start}-{len(data)-1}/{len(data)}'})
+        else :
+            self.send('Not found', code=404)
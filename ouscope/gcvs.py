@@ -0,0 +1,171 @@
+"""Local General Catalogue of Variable Stars with a spatial index."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../17_gcvs.ipynb.
+
+# %% ../17_gcvs.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['gcvs_name', 'GCVS', 'unit_vectors', 'normalize_table']
+
+# %% ../17_gcvs.ipynb 4
+import os
+import re
+import logging
+from fastcore.basics import patch
+
+# %% ../17_gcvs.ipynb 6
+def gcvs_name(row, n=0):
+    '''
+    Normalized name of the variable star from the row of the 
+    B/gcvs catalog table. The `n` is used for the unnamed stars.
+    '''
+    keys = row.keys() if hasattr(row, 'keys') else row.colnames
+    if 'Name' in keys:
+        name = str(row['Name'])
+    elif 'GCVS' in keys:
+        name = str(row['GCVS'])
+    elif 'NSV' in keys:
+        name = f'NSV_{row["NSV"]}'
+    else :
+        name = f'VS_{n}'
+    name = ' '.join(name.split())
+    return re.sub(r'^V0+(?=\d)', 'V', name)
+
+# %% ../17_gcvs.ipynb 9
+class GCVS:
+    '''
+    Local copy of the GCVS catalog with the spatial index.
+    '''
+    catalog = 'B/gcvs'
+
+    def __init__(self, fn='.cache/gcvs.ecsv'):
+        import numpy as np
+        from astropy.table import Table
+        from scipy.spatial import cKDTree
+
+        if not os.path.isfile(fn):
+            GCVS.fetch(fn)
+        tab = Table.read(fn)
+        if 'name' not in tab.colnames :
+            tab = normalize_table(tab)
+        self.name = np.asarray(tab['name'], dtype=str)
+        self.ra = np.asarray(tab['ra'], dtype=float)
+        self.dec = np.asarray(tab['dec'], dtype=float)
+        self.mag = np.asarray(np.ma.filled(tab['mag'], np.nan), dtype=float)
+        self.tree = cKDTree(unit_vectors(self.ra, self.dec))
+
+    def __len__(self):
+        return len(self.name)
+
+    @staticmethod
+    def fetch(fn='.cache/gcvs.ecsv'):
+        '''
+        Download the catalog from VizieR and store it normalized in fn.
+        '''
+        from astropy.table import vstack
+        from astroquery.vizier import Vizier
+
+        logging.getLogger(__name__).info(f'Downloading {GCVS.catalog} catalog')
+        tabs = Vizier(row_limit=-1, columns=['**']).get_catalogs(GCVS.catalog)
+        os.makedirs(os.path.dirname(fn) or '.', exist_ok=True)
+        vstack([normalize_table(t) for t in tabs]).write(fn, overwrite=True)
+
+# %% ../17_gcvs.ipynb 10
+def unit_vectors(ra, dec):
+    '''
+    Unit vectors of the ra, dec (degrees) positions as (n,3) array.
+    '''
+    import numpy as np
+
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.stack([np.cos(dec)*np.cos(ra), np.cos(dec)*np.sin(ra), np.sin(dec)], axis=-1)
+
+def normalize_table(tab):
+    '''
+    Convert the B/gcvs table to the (name, ra, dec, mag) table 
+    with normalized names and coordinates in degrees. 
+    The rows without coordinates are dropped.
+    '''
+    import numpy as np
+    import astropy.units as u
+    from astropy.table import Table
+    from astropy.coordinates import SkyCoord
+
+    for rac, decc in (('RAJ2000', 'DEJ2000'), ('_RA.icrs', '_DE.icrs'), ('RAdeg', 'DEdeg')):
+        if rac in tab.colnames :
+            break
+    else :
+        raise KeyError('No coordinate columns in the table')
+    ra, dec = tab[rac], tab[decc]
+    ok = ~(np.ma.getmaskarray(ra) | np.ma.getmaskarray(dec))
+    if ra.dtype.kind in 'US' :
+        ok &= np.char.str_len(np.char.strip(np.asarray(ra, dtype=str))) > 0
+        c = SkyCoord(np.asarray(ra[ok], dtype=str), np.asarray(dec[ok], dtype=str),
+                     unit=(u.hourangle, u.deg))
+        ra, dec = c.ra.deg, c.dec.deg
+    else :
+        ra, dec = np.asarray(ra[ok], dtype=float), np.asarray(dec[ok], dtype=float)
+    idx = np.flatnonzero(ok)
+    mag = (np.ma.filled(np.ma.asarray(tab['magMax'][ok], dtype=float), np.nan) 
+           if 'magMax' in tab.colnames else np.full(len(idx), np.nan))
+    return Table({'name': [gcvs_name(tab[i], i) for i in idx],
+                  'ra': ra, 'dec': dec, 'mag': mag})
+
+# %% ../17_gcvs.ipynb 11
+@patch
+def cone(self: GCVS, ra, dec, radius):
+    '''
+    Stars within `radius` degrees from ra, dec.
+    '''
+    return self.cones(ra, dec, radius)[0]
+
+# %% ../17_gcvs.ipynb 12
+@patch
+def cones(self: GCVS, ra, dec, radius):
+    '''
+    Bulk cone query: list of the index arrays for the arrays 
+    of ra, dec and radius (scalar or array, degrees).
+    '''
+    import numpy as np
+
+    ra, dec = np.atleast_1d(ra), np.atleast_1d(dec)
+    # Chord length of the radius on the unit sphere
+    r = 2*np.sin(np.radians(np.broadcast_to(radius, ra.shape))/2)
+    res = self.tree.query_ball_point(unit_vectors(ra, dec), r, return_sorted=True)
+    return [np.array(l, dtype=int) for l in res]
+
+# %% ../17_gcvs.ipynb 13
+@patch
+def in_footprints(self: GCVS, wcss, shapes=None):
+    '''
+    Bulk footprint query: list of the index arrays of the stars
+    inside the frames described by the WCSs (astropy WCS or headers).
+    The shapes of the frames default to the pixel shapes of the WCSs.
+    '''
+    import numpy as np
+    from astropy.wcs import WCS
+
+    wcss = [w if isinstance(w, WCS) else WCS(w) for w in wcss]
+    if shapes is None :
+        shapes = [w.pixel_shape[::-1] for w in wcss]
+    # Bounding cones of the frames: center and the farthest corner
+    ra, dec, rad = np.zeros((3, len(wcss)))
+    for n, (w, (ny, nx)) in enumerate(zip(wcss, shapes)):
+        v = unit_vectors(*w.pixel_to_world_values([(nx-1)/2, -0.5, nx-0.5, -0.5, nx-0.5], 
+                                                  [(ny-1)/2, -0.5, -0.5, ny-0.5, ny-0.5]))
+        ra[n], dec[n] = w.pixel_to_world_values((nx-1)/2, (ny-1)/2)
+        rad[n] = np.degrees(2*np.arcsin(np.linalg.norm(v[1:] - v[0], axis=1).max()/2))
+    res = []
+    for w, (ny, nx), idx in zip(wcss, shapes, self.cones(ra, dec, rad)):
+        x, y = w.world_to_pixel_values(self.ra[idx], self.dec[idx])
+        res.append(idx[(x >= -0.5) & (x < nx-0.5) & (y >= -0.5) & (y < ny-0.5)])
+    return res
+
+# %% ../17_gcvs.ipynb 14
+@patch
+def in_footprint(self: GCVS, wcs, shape=None):
+    '''
+    Stars inside the frame described by the WCS.
+    '''
+    return self.in_footprints([wcs], None if shape is None else [shape])[0]
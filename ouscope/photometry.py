@@ -0,0 +1,273 @@
+"""Vectorized aperture photometry of the variable stars and their comparison sequences."""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../35_photometry.ipynb.
+
+# %% ../35_photometry.ipynb 2
+from __future__ import annotations
+
+# %% auto 0
+__all__ = ['stack_photometry', 'sky_to_pixels', 'sequence_stars', 'job_photometry', 'batch_photometry', 'field_task',
+           'sequence_catalog', 'Ensemble']
+
+# %% ../35_photometry.ipynb 4
+import os
+import logging
+from fastcore.basics import patch
+from concurrent.futures import ProcessPoolExecutor
+
+# %% ../35_photometry.ipynb 6
+def stack_photometry(layers, x, y, r=4.0, r_in=8.0, r_out=12.0, gain=1.0):
+    '''
+    Aperture photometry of N stars on L layers (sequence of 2D arrays).
+    The x, y are (N,) or (L,N) arrays of 0-based pixel positions.
+    Returns the dictionary of (L,N) arrays: flux, flux_err, bkg (per pixel),
+    mag and mag_err (instrumental). The stars with the aperture not fully
+    inside the layer are NaN.
+    '''
+    import numpy as np
+    from astropy.stats import SigmaClip
+    from photutils.aperture import (CircularAperture, CircularAnnulus, 
+                                    ApertureStats, aperture_photometry)
+
+    nl = len(layers)
+    x = np.broadcast_to(np.asarray(x, dtype=float), (nl, np.shape(x)[-1]))
+    y = np.broadcast_to(np.asarray(y, dtype=float), x.shape)
+    res = {k: np.full(x.shape, np.nan) for k in ('flux', 'flux_err', 'bkg')}
+    area = np.pi*r**2
+    clip = SigmaClip(sigma=3.0, maxiters=5)
+    for n, data in enumerate(layers):
+        ny, nx = data.shape
+        ok = ((x[n] - r_out >= -0.5) & (x[n] + r_out < nx - 0.5) & 
+              (y[n] - r_out >= -0.5) & (y[n] + r_out < ny - 0.5))
+        if not ok.any():
+            continue
+        pos = np.c_[x[n, ok], y[n, ok]]
+        ann = ApertureStats(data, CircularAnnulus(pos, r_in, r_out), sigma_clip=clip)
+        bkg, std, nann = np.asarray(ann.median), np.asarray(ann.std), np.asarray(ann.sum_aper_area)
+        tot = np.asarray(aperture_photometry(data, CircularAperture(pos, r))['aperture_sum'])
+        flux = tot - bkg*area
+        res['flux'][n, ok] = flux
+        res['bkg'][n, ok] = bkg
+        res['flux_err'][n, ok] = np.sqrt(np.maximum(flux, 0)/gain + area*std**2*(1 + area/nann))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        res['mag'] = -2.5*np.log10(res['flux'])
+        res['mag_err'] = 2.5/np.log(10)*res['flux_err']/res['flux']
+    return res
+
+# %% ../35_photometry.ipynb 8
+def sky_to_pixels(wcss, ra, dec):
+    '''
+    Pixel positions (L,N arrays) of the stars at ra, dec (degrees)
+    in the layers described by the list of WCSs (astropy WCS or headers).
+    '''
+    import numpy as np
+    from astropy.wcs import WCS
+
+    xy = [(w if isinstance(w, WCS) else WCS(w)).world_to_pixel_values(ra, dec) for w in wcss]
+    return np.array([p[0] for p in xy]), np.array([p[1] for p in xy])
+
+# %% ../35_photometry.ipynb 9
+def sequence_stars(seq, target=None, ra=None, dec=None):
+    '''
+    Names and coordinates (degrees) of the stars of the comparison sequence 
+    (as returned by `get_VS_sequence`), with the target at ra, dec first.
+    '''
+    import numpy as np
+
+    stars = seq[1] if seq and seq[1] else []
+    names = [s[1] for s in stars]
+    sra, sdec = [s[3] for s in stars], [s[5] for s in stars]
+    if target is not None:
+        names, sra, sdec = [target] + names, [ra] + sra, [dec] + sdec
+    return names, np.array(sra, dtype=float), np.array(sdec, dtype=float)
+
+# %% ../35_photometry.ipynb 10
+def job_photometry(layers, wcs, names, ra, dec, filters=None, **kwargs):
+    '''
+    Photometry of the stars (names, ra, dec) in all layers of the job.
+    The `wcs` is the solution of the frame or the list of the solutions
+    of the layers. Returns the table with the row for every layer and star.
+    The `kwargs` are passed to `stack_photometry`.
+    '''
+    import numpy as np
+    from astropy.table import Table
+
+    layers = [getattr(l, 'data', l) for l in layers]
+    filters = [str(n) for n in range(len(layers))] if filters is None else list(filters)
+    wcss = wcs if isinstance(wcs, (list, tuple)) else [wcs]*len(layers)
+    x, y = sky_to_pixels(wcss, ra, dec)
+    res = stack_photometry(layers, x, y, **kwargs)
+    nl, ns = x.shape
+    return Table({'filter': np.repeat(filters, ns), 'name': np.tile(names, nl),
+                  'ra': np.tile(ra, nl), 'dec': np.tile(dec, nl),
+                  'x': x.ravel(), 'y': y.ravel(),
+                  **{k: v.ravel() for k, v in res.items()}})
+
+# %% ../35_photometry.ipynb 12
+def _task_photometry(task, kwargs):
+    from astropy.io import fits
+
+    key, layers, wcs, names, ra, dec, filters = task
+    try :
+        hdus = [fits.open(l, memmap=True)[0] if isinstance(l, (str, os.PathLike)) else l 
+                for l in layers]
+        return key, job_photometry(hdus, wcs, names, ra, dec, filters, **kwargs)
+    except Exception as e :
+        logging.getLogger(__name__).warning(f'Photometry of {key} failed: {e}')
+        return key, None
+
+def _chunk_photometry(chunk, kwargs):
+    return [_task_photometry(t, kwargs) for t in chunk]
+
+def batch_photometry(tasks, workers=None, chunksize=8, **kwargs):
+    '''
+    Photometry of many jobs. Returns the dictionary: key -> table
+    (None for the failed jobs). The `kwargs` are passed to `stack_photometry`.
+    '''
+    tasks = list(tasks)
+    if workers == 0:
+        return dict(_chunk_photometry(tasks, kwargs))
+    chunks = [tasks[i:i+chunksize] for i in range(0, len(tasks), chunksize)]
+    res = {}
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for part in ex.map(_chunk_photometry, chunks, [kwargs]*len(chunks)):
+            res.update(part)
+    return res
+
+# %% ../35_photometry.ipynb 13
+def field_task(key, hdul, wcs, gcvs, seqs=None):
+    '''
+    Photometry task for the solved job: all GCVS variables inside the frame
+    and the stars of their comparison sequences (dictionary: name -> sequence,
+    e.g. from `SequenceService.prefetch`). The layers opened from files
+    are passed by the file name.
+    '''
+    import numpy as np
+
+    shape = hdul[0].shape
+    idx = gcvs.in_footprint(wcs, shape)
+    names, ra, dec = list(gcvs.name[idx]), list(gcvs.ra[idx]), list(gcvs.dec[idx])
+    seen = set(names)
+    for vs in list(names):
+        seq = (seqs or {}).get(vs)
+        for n, r, d in zip(*sequence_stars(seq)):
+            if n not in seen:
+                seen.add(n)
+                names.append(n), ra.append(r), dec.append(d)
+    layers = [h.fileinfo()['file'].name if h.fileinfo() else h.data for h in hdul]
+    filters = [h.header.get('FILTER', str(n)) for n, h in enumerate(hdul)]
+    return key, layers, wcs, names, np.array(ra), np.array(dec), filters
+
+# %% ../35_photometry.ipynb 16
+def sequence_catalog(seq, bands='BVRI'):
+    '''
+    Catalog magnitudes of the sequence stars (as returned by `get_VS_sequence`):
+    dictionary name -> {band: magnitude}. The missing magnitudes are skipped.
+    '''
+    cat = {}
+    for s in (seq[1] if seq and seq[1] else []):
+        mags = {}
+        for b, v in zip(bands, s[6:]):
+            try :
+                mags[b] = float(v.split()[0])
+            except (ValueError, IndexError, AttributeError):
+                pass
+        cat[s[1]] = mags
+    return cat
+
+# %% ../35_photometry.ipynb 17
+class Ensemble:
+    '''
+    Ensemble photometric calibration of many frames: zero points of frames,
+    color terms of groups of frames and offsets of stars solved together.
+    '''
+    def __init__(self, floor=0.01, damp=0.0):
+        self.floor = floor
+        self.damp = damp
+        self.index = {}
+        self.obs = []
+        self.x = None
+
+    def __len__(self):
+        return sum(len(o[0]) for o in self.obs)
+
+    def _col(self, key):
+        return self.index.setdefault(key, len(self.index))
+
+    def add(self, frame, group, stars, mag, err, cat, color):
+        '''
+        Add the measurements of the comparison stars in one frame:
+        instrumental magnitudes `mag` with errors `err`, catalog magnitudes
+        `cat` and colors `color`. The non-finite values are skipped.
+        '''
+        import numpy as np
+
+        mag, err, cat, color = (np.asarray(a, dtype=float) for a in (mag, err, cat, color))
+        ok = np.isfinite(mag) & np.isfinite(err) & np.isfinite(cat) & np.isfinite(color)
+        if not ok.any():
+            return 0
+        zc, kc = self._col(('zp', frame)), self._col(('k', group))
+        sc = np.array([self._col(('star', s)) for s, o in zip(stars, ok) if o])
+        w = 1/np.sqrt(err[ok]**2 + self.floor**2)
+        self.obs.append((np.full(len(sc), zc), np.full(len(sc), kc), sc, 
+                         color[ok], mag[ok] - cat[ok], w))
+        return len(sc)
+
+    def add_job(self, frame, tab, catalog, group=None, color=('B', 'V')):
+        '''
+        Add the photometry table of the job (from `job_photometry`) 
+        with the catalog of the comparison stars (from `sequence_catalog`).
+        The group of the color term defaults to the filter of the layer.
+        '''
+        import numpy as np
+
+        n = 0
+        for filt in np.unique(tab['filter']):
+            band = str(filt)[:1].upper()
+            rows = tab[(tab['filter'] == filt) & np.isin(tab['name'], list(catalog))]
+            cat = [catalog[s].get(band, np.nan) for s in rows['name']]
+            col = [catalog[s].get(color[0], np.nan) - catalog[s].get(color[1], np.nan)
+                   for s in rows['name']]
+            n += self.add((frame, str(filt)), str(filt) if group is None else group,
+                          list(rows['name']), rows['mag'], rows['mag_err'], cat, col)
+        return n
+
+# %% ../35_photometry.ipynb 18
+@patch
+def solve(self: Ensemble, atol=1e-8, btol=1e-8, iter_lim=None):
+    '''
+    Solve the ensemble (starting from the previous solution).
+    Returns the dictionary with zp (frame -> zero point), k (group ->
+    color term), offset (star -> offset), rms (weighted rms of the 
+    residuals in sigmas) and the number of the lsqr iterations.
+    '''
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.linalg import lsqr
+
+    zc, kc, sc, col, dm, w = (np.concatenate(a) for a in zip(*self.obs))
+    n, nx = len(dm), len(self.index)
+    stars = np.array([c for k, c in self.index.items() if k[0] == 'star'])
+    # Gauge: offsets of the stars with zero mean and not correlated with color
+    # (a common shift of the color terms is equivalent to the offsets ~ color)
+    cs = np.bincount(sc, col, nx)[stars]/np.bincount(sc, None, nx)[stars]
+    cs -= cs.mean()
+    wg = np.sqrt(n)/len(stars)
+    rows = np.r_[np.repeat(np.arange(n), 3), np.full(len(stars), n), np.full(len(stars), n+1)]
+    cols = np.r_[np.stack([zc, kc, sc], axis=1).ravel(), stars, stars]
+    vals = np.r_[(w[:, None]*np.stack([np.ones(n), col, np.ones(n)], axis=1)).ravel(),
+                 np.full(len(stars), wg), wg*cs/max(np.abs(cs).max(), 1e-6)]
+    A = csr_matrix((vals, (rows, cols)), shape=(n + 2, nx))
+    b = np.r_[w*dm, 0, 0]
+    x0 = np.zeros(nx)
+    if self.x is not None:
+        x0[:len(self.x)] = self.x
+    x, istop, itn, r1norm = lsqr(A, b, damp=self.damp, atol=atol, btol=btol, 
+                                 iter_lim=iter_lim, x0=x0)[:4]
+    self.x = x
+    res = {'zp': {}, 'k': {}, 'offset': {}}
+    for (kind, key), c in self.index.items():
+        res['zp' if kind == 'zp' else 'k' if kind == 'k' else 'offset'][key] = x[c]
+    res['rms'] = r1norm/np.sqrt(n)
+    res['itn'] = itn
+    return res
@@ -3,71 +3,96 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../30_process.ipynb.
 
 # %% auto 0
-__all__ = ['verts', 'codes', 'marker', 'plot_sequence', 'process_job', 'analyse_job']
+__all__ = ['verts', 'codes', 'plot_sequence', 'process_job', 'analyse_job']
 
 # %% ../30_process.ipynb 4
-import configparser
-from fastcore.basics import patch
-from os.path import expanduser
-from ouscope.core import Telescope
-from ouscope.solver import Solver
+from ouscope.solver import Solver, SolverPool, find_sources
+from ouscope.gcvs import GCVS
 
-from IPython import display
+from functools import lru_cache
+from collections import OrderedDict
+from ouscope.vs import sequence_service
 
-import time
-from datetime import datetime
-import os
-from requests import session
-from bs4 import BeautifulSoup
-from io import StringIO, BytesIO
-from zipfile import ZipFile
-from astropy.io import fits
-from astropy.coordinates import SkyCoord, Longitude, Latitude
-import astropy.units as u
-from astropy.wcs import WCS
-from astropy.io import fits
-from astropy.visualization import simple_norm
-from astroquery.vizier import Vizier
-from tqdm.auto import tqdm
-import matplotlib as mpl
-from matplotlib import pyplot as plt
-from matplotlib.path import Path
-import numpy as np
-from photutils.detection import DAOStarFinder
-from astropy.stats import sigma_clipped_stats
-from numpy import argsort
-from sqlitedict import SqliteDict
+# %% ../30_process.ipynb 13
+_transforms = OrderedDict()
 
-from astropy.visualization import make_lupton_rgb
+def register_layers(layers, ref=1, key=None, step=2, nstars=50, maxsize=256):
+    '''
+    Transforms (3x3 matrices in x,y) mapping the pixels of the layers
+    onto the reference layer. The transforms are estimated from the star
+    lists detected on the layers downsampled by `step` and cached under
+    the `key` (e.g. the job id and telescope). Identity is used for the 
+    layers which cannot be registered.
+    '''
+    import numpy as np
+    import astroalign as aa
 
-import astroalign as aa
-from collections import namedtuple
-from ouscope.vs import get_VS_sequence
+    if key is not None and key in _transforms:
+        _transforms.move_to_end(key)
+        return _transforms[key]
+    def stars(l):
+        ny, nx = (s//step*step for s in l.shape)
+        small = l[:ny, :nx].reshape(ny//step, step, nx//step, step).mean(axis=(1, 3))
+        x, y, _ = find_sources(small, nstars)
+        return np.c_[x, y]*step + (step - 1)/2
+    pts = [stars(l) for l in layers]
+    res = []
+    for n, p in enumerate(pts):
+        try :
+            res.append(np.eye(3) if n == ref else aa.find_transform(p, pts[ref])[0].params)
+        except (aa.MaxIterError, ValueError, TypeError):
+            res.append(np.eye(3))
+    if key is not None:
+        _transforms[key] = res
+        while len(_transforms) > maxsize:
+            _transforms.popitem(last=False)
+    return res
 
-# %% ../30_process.ipynb 5
-plt.rcParams['image.cmap'] = 'gray'
+# %% ../30_process.ipynb 14
+def _warp(layer, m, out):
+    '''
+    Warp the layer with the x,y transform matrix m into the float32 array out.
+    '''
+    import numpy as np
+    from scipy.ndimage import affine_transform
 
-# %% ../30_process.ipynb 13
-def make_color_image(layers, black=1.0, Q=5, stretch=200, mults=(0.95, 1.0, 1.0), order='BVR'):
+    if np.allclose(m, np.eye(3)):
+        out[...] = layer
+        return out
+    # Inverse transform in the row, column order
+    inv = np.linalg.inv(m)
+    return affine_transform(layer, inv[1::-1, 1::-1], offset=inv[1::-1, 2], 
+                            output=out, order=1, mode='nearest')
 
-    seq = argsort(list(order))
-    b, r, g = (m*layers[l] for m,l in zip(mults,seq))
-    # print([order[i] for i in seq])
-    
-    try :
-        r_r, r_f = aa.register(r, g, detection_sigma=10)
-    except TypeError:
-        r_r = r
-        
-    try :
-        b_r, b_f = aa.register(b, g, detection_sigma=10)
-    except TypeError:
-        b_r = b
-        
-    minlev = np.array([sigma_clipped_stats(l, sigma=3.0)[1] for l in (r,g,b)])
-    return make_lupton_rgb(0.9*r_r, g, b_r, minimum=black*minlev, Q=Q, stretch=stretch)
+# %% ../30_process.ipynb 15
+def make_color_image(layers, black=1.0, Q=5, stretch=200, mults=(0.95, 1.0, 1.0), order='BVR', 
+                     key=None, step=4):
+    '''
+    Color composite of the B, V, R layers (in the given `order`) registered 
+    onto the V layer. The transforms are cached under the `key` (see
+    `register_layers`). The background levels are estimated on every
+    `step`-th pixel. All work is done in float32 arrays.
+    '''
+    import numpy as np
+    from astropy.stats import sigma_clipped_stats
+    from astropy.visualization import make_lupton_rgb
 
-# %% ../30_process.ipynb 14
+    seq = np.argsort(list(order))
+    # b, r, g: B, R and V layers
+    src = [layers[l] for l in seq]
+    tr = register_layers(src, ref=2, key=key)
+    out = []
+    for l, m, mult in zip(src, tr, mults):
+        o = _warp(l, m, np.empty(l.shape, dtype=np.float32))
+        o *= mult
+        out.append(o)
+    b, r, g = out
+    # Background levels before the extra 0.9 weight of the R layer
+    minlev = np.array([sigma_clipped_stats(l[::step, ::step], sigma=3.0)[1] for l in (r,g,b)])
+    r *= 0.9
+    return make_lupton_rgb(r, g, b, minimum=black*minlev, Q=Q, stretch=stretch)
+
+# %% ../30_process.ipynb 17
 verts = [
     (0, 0.5),
     (0.3, 0.5),
@@ -76,11 +101,18 @@ verts = [
 ]
 verts = verts + [(y, x) for x, y in verts]
 verts = [(y-0.5, x-0.5) for x, y in verts]
-codes = 4*[Path.MOVETO, Path.LINETO]
-marker = Path(verts, codes)
+# Path.MOVETO, Path.LINETO
+codes = 4*[1, 2]
 
-# %% ../30_process.ipynb 15
+@lru_cache
+def _marker():
+    from matplotlib.path import Path
+    return Path(verts, codes)
+
+# %% ../30_process.ipynb 18
 def plot_sequence(vs):
+    from matplotlib import pyplot as plt
+
     if vs in VSdb:
         seq = VSdb[vs]['seq']
         if not seq[0]:
@@ -90,21 +122,38 @@ def plot_sequence(vs):
     for s in seq[1]:
         print(s)
         dx = 20/3600
-        ax.plot(s[3], s[5], marker=marker, lw=1, color='C2', ms=30, transform=ax.get_transform('world'))
+        ax.plot(s[3], s[5], marker=_marker(), lw=1, color='C2', ms=30, transform=ax.get_transform('world'))
         ax.text(s[3]+dx, s[5]-dx, s[1], color='white', transform=ax.get_transform('world'))
 
-# %% ../30_process.ipynb 16
-def process_job(jid, reprocess=False, cls=True, layer=None):
+# %% ../30_process.ipynb 19
+@lru_cache
+def _solver_pool():
+    '''
+    Shared pool solving the filter layers in parallel, created on first use.
+    '''
+    return SolverPool(Solver())
+
+@lru_cache
+def _gcvs():
+    '''
+    Local GCVS catalog, loaded on first use.
+    '''
+    return GCVS()
+
+# %% ../30_process.ipynb 20
+def process_job(jid, reprocess=False, cls=True, layer=None, pool=None, gcvs=None):
+    from IPython import display
+    from astropy.wcs import WCS
+    from astropy.visualization import simple_norm
+    from matplotlib import pyplot as plt
+
     job = OSO.get_job(jid)
     ctime = job['completion']
     req = OSO.get_request(int(job['rid'].split()[0]))
     target = req['name'].lstrip().rstrip()
     print(f'jid {jid}: ({target})')
     print(f'{" ".join(ctime)}')
-    z = OSO.get_obs(job, cube=False, verbose=False)    
-    hdul=[fits.open(BytesIO(z.read(name)))[0] for name in z.namelist()]
-    if layer is not None:
-        hdul=[hdul[layer]]
+    hdul = OSO.get_layers(job, layers=None if layer is None else [layer])
     # hdul = fits.open(OSO.get_obs(job, cube=True, verbose=False))
     print(f'Filters: {tuple(hdu.header["FILTER"] for hdu in hdul)}')
     if not reprocess and jid in DB :
@@ -114,76 +163,35 @@ def process_job(jid, reprocess=False, cls=True, layer=None):
         return
     hi = min(1, len(hdul)-1)
     # hi = 0
-    for hdu in hdul:
-        wcs_head = solver.solve(hdu, tout=30)
-        if wcs_head:
-            break
+    pool = _solver_pool() if pool is None else pool
+    gcvs = _gcvs() if gcvs is None else gcvs
+    solved = pool.solve_first(hdul, tout=30).result()
+    wcs_head = solved[1] if solved else None
     if not wcs_head:
         print('Cannot solve image')
         OSO.get_obs(job, cube=True, verbose=False)
         data = hdul[hi].data[:-32,:-32]
-        plt.imshow(data, norm=simple_norm(data, 'asinh', asinh_a=0.01))
+        plt.imshow(data, norm=simple_norm(data, 'asinh', asinh_a=0.01), cmap='gray')
         plt.show();
         return
     w = WCS(wcs_head)
-    box = w.calc_footprint()
-    c = box.mean(axis=0)
-    s = box.max(axis=0) - box.min(axis=0)
-    result = Vizier.query_region(catalog='B/gcvs', 
-                                 coordinates=SkyCoord(*c, unit='deg', frame='fk5'), 
-                                 width=f'{s[0]}deg', height=f'{s[1]}deg')
-#     for g in result:
-#         for n, o in enumerate(g):
-#             if 'Name' in o.keys():
-#                 name = o['Name']
-#             elif 'GCVS' in o.keys():
-#                 name = ' '.join(o['GCVS'].split())
-#             elif 'NSV' in o.keys():
-#                 name = f'NSV_{o["NSV"]}'
-
-#             print(f'{name:12} {o["magMax"]:6.2f}', o)
     ax = plt.subplot(projection=w)
     plt.grid(color='white', ls='solid')
-    for g in result:
-        print(g)
-        for n, o in enumerate(g):
-            if 'Name' in o.keys():
-                name = o['Name']
-            elif 'GCVS' in o.keys():
-                name = ' '.join(o['GCVS'].split())
-            elif 'NSV' in o.keys():
-                name = f'NSV_{o["NSV"]}'
-            else :
-                name = f'VS_{n}'
-            if name.startswith('V0'):
-                name = 'V'+name[2:]
-            if name in VSdb:
-                jobl = VSdb[name]
-            else :
-                jobl = {}
-                jobl['jobs']=set()
-            jobl['jobs'] |= {jid}
-            VSdb[name]=jobl
-            try :
-                frame='icrs'
-                try :
-                    radec = SkyCoord(o['RAJ2000'] + o['DEJ2000'], 
-                                     frame=frame, unit=(u.hourangle, u.deg))
-                except ValueError:
-                    radec = SkyCoord(o['RAJ2000'], o['DEJ2000'], 
-                                     frame=frame, unit=(u.deg, u.deg))                    
-            except KeyError:
-                    radec =  SkyCoord(o['_RA.icrs'] + o['_DE.icrs'], 
-                                     frame='icrs', unit=(u.hourangle, u.deg))
-                    frame='icrs'
-#                     radec =  SkyCoord(o['RAB1950'] + o['DEB1950'], 
-#                                      frame='fk4', unit=(u.hourangle, u.deg))
-            ax.plot(radec.ra.deg, radec.dec.deg, marker=marker, color='C1', ms=30,
-                    transform=ax.get_transform('world'), )#edgecolor='yellow', facecolor='none')
-            ax.text(radec.ra.deg+0.012, radec.dec.deg-0.012, f'{name} ({o["magMax"]:.1f})', 
-                    transform=ax.get_transform('world'), color='white')
-            if name.lstrip().rstrip().lower() == target.lower():
-                plot_sequence(target)
+    for n in gcvs.in_footprint(w, hdul[0].shape):
+        name = gcvs.name[n]
+        if name in VSdb:
+            jobl = VSdb[name]
+        else :
+            jobl = {}
+            jobl['jobs']=set()
+        jobl['jobs'] |= {jid}
+        VSdb[name]=jobl
+        ax.plot(gcvs.ra[n], gcvs.dec[n], marker=_marker(), color='C1', ms=30,
+                transform=ax.get_transform('world'), )#edgecolor='yellow', facecolor='none')
+        ax.text(gcvs.ra[n]+0.012, gcvs.dec[n]-0.012, f'{name} ({gcvs.mag[n]:.1f})', 
+                transform=ax.get_transform('world'), color='white')
+        if name.lstrip().rstrip().lower() == target.lower():
+            plot_sequence(target)
                 
     if cls :
         display.clear_output(wait=True)
@@ -191,21 +199,22 @@ def process_job(jid, reprocess=False, cls=True, layer=None):
         print(f'{" ".join(ctime)}')
         print(f'Filters: {tuple(hdu.header["FILTER"] for hdu in hdul)}')
 
-    try :
-        if len(hdul)==3:
-            plt.imshow(make_color_image([hdu.data[:-32,:-32] for hdu in hdul], order=tuple(hdu.header["FILTER"] for hdu in hdul)))
-        else :
-            data = hdul[hi].data[:-32,:-32]
-            plt.imshow(data, norm=simple_norm(data, 'asinh', asinh_a=0.01))
-    except aa.MaxIterError:
+    # Layers which cannot be registered are left in place by make_color_image
+    if len(hdul)==3:
+        plt.imshow(make_color_image([hdu.data[:-32,:-32] for hdu in hdul], 
+                                    order=tuple(hdu.header["FILTER"] for hdu in hdul),
+                                    key=(jid, hdul[0].header.get('TELESCOP'))))
+    else :
         data = hdul[hi].data[:-32,:-32]
-        plt.imshow(data, norm=simple_norm(data, 'asinh', asinh_a=0.01))
+        plt.imshow(data, norm=simple_norm(data, 'asinh', asinh_a=0.01), cmap='gray')
     DB[jid]=Job(jid, [int(rid[1:]) for rid in job['rid'].split()], True)
     plt.show()
     display.display(plt.gcf());    
 
-# %% ../30_process.ipynb 17
-def analyse_job(jid, rid=None, reprocess=False):
+# %% ../30_process.ipynb 21
+def analyse_job(jid, rid=None, reprocess=False, pool=None, gcvs=None):
+    from astropy.wcs import WCS
+
     job = OSO.get_job(jid)
     ctime = job['completion']
     if rid is None:
@@ -213,64 +222,44 @@ def analyse_job(jid, rid=None, reprocess=False):
     req = OSO.get_request(rid)
     target = req['name'].lstrip().rstrip()
     print(f'J{jid}:R{rid} ({target}) {" ".join(ctime)}')
-    z = OSO.get_obs(job, cube=False, verbose=False)
-    hdul=[fits.open(BytesIO(z.read(name)))[0] for name in z.namelist()]
+    hdul = OSO.get_layers(job)
     print(f'Filters: {" ".join(hdu.header["FILTER"] for hdu in hdul)}')
     if not reprocess and jid in DB:
         print('Done')
         return
     hi = min(1, len(hdul)-1)
     # hi = 0
-    for hdu in hdul:
-        wcs_head = solver.solve(hdu, tout=30)
-        if wcs_head:
-            break
+    pool = _solver_pool() if pool is None else pool
+    gcvs = _gcvs() if gcvs is None else gcvs
+    solved = pool.solve_first(hdul, tout=30).result()
+    wcs_head = solved[1] if solved else None
     if not wcs_head:
         print('Cannot solve image')
         OSO.get_obs(job, cube=True, verbose=False)
         return
     w = WCS(wcs_head)
-    box = w.calc_footprint()
-    c = box.mean(axis=0)
-    s = box.max(axis=0) - box.min(axis=0)
-    result = Vizier.query_region(catalog='B/gcvs', 
-                                 coordinates=SkyCoord(*c, unit='deg', frame='fk5'), 
-                                 width=f'{s[0]}deg', height=f'{s[1]}deg')
-    for g in result:
-        for n, o in enumerate(g):
-            if 'Name' in o.keys():
-                name = o['Name']
-            elif 'GCVS' in o.keys():
-                name = ' '.join(o['GCVS'].split())
-            elif 'NSV' in o.keys():
-                name = f'NSV_{o["NSV"]}'
-            else :
-                name = f'VS_{n}'
-            if name.startswith('V0'):
-                name = 'V'+name[2:]
-            if name in VSdb:
-                jobl = VSdb[name]
-            else :
-                jobl = {}
-                jobl['jobs']=set()
-                jobl['seq']=None
-            try :
-                jobl['jobs'] |= {jid}
-            except TypeError:
-                jobl['jobs'] = {jid}
-            if not jobl['seq']:
-                try :
-                    seq = get_VS_sequence(name, 40, 16)
-                except ConnectionError:
-                    time.sleep(5)
-                    seq = get_VS_sequence(name, 40, 16)
-                if seq[0] and seq[1]:
-                    jobl['seq']=seq
-            VSdb[name]=jobl
-            print(f'{name}', end=" ")
-            if jobl["seq"] and jobl["seq"][0] and jobl["seq"][1]:
-                print(f'seq:{jobl["seq"][0]} ({len(jobl["seq"][1])})')
-            else :
-                print()                      
+    names = gcvs.name[gcvs.in_footprint(w, hdul[0].shape)]
+    seqs = sequence_service().prefetch(names, 40, 16)
+    for name in names:
+        if name in VSdb:
+            jobl = VSdb[name]
+        else :
+            jobl = {}
+            jobl['jobs']=set()
+            jobl['seq']=None
+        try :
+            jobl['jobs'] |= {jid}
+        except TypeError:
+            jobl['jobs'] = {jid}
+        if not jobl['seq']:
+            seq = seqs[name]
+            if seq[0] and seq[1]:
+                jobl['seq']=seq
+        VSdb[name]=jobl
+        print(f'{name}', end=" ")
+        if jobl["seq"] and jobl["seq"][0] and jobl["seq"][1]:
+            print(f'seq:{jobl["seq"][0]} ({len(jobl["seq"][1])})')
+        else :
+            print()                      
     DB[jid]=Job(jid, [int(rid[1:]) for rid in job['rid'].split()], True)
     return True
@@ -3,7 +3,8 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../15_solver.ipynb.
 
 # %% auto 0
-__all__ = ['Solver']
+__all__ = ['WCSHints', 'refine_wcs', 'radec_to_healpix', 'IndexSet', 'Solver', 'kill_solver', 'find_sources', 'write_xylist',
+           'SolverPool']
 
 # %% ../15_solver.ipynb 3
 import configparser
@@ -11,16 +12,208 @@ import logging
 from fastcore.basics import patch
 from os.path import expanduser
 import os, tempfile, shutil
+import hashlib, glob
+import shlex, signal, subprocess, threading
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError
 from io import StringIO, BytesIO
-from astroquery.exceptions import TimeoutError as ASTTimeoutError
-from astropy.time import Time
-from astropy.io import fits
-from astropy.coordinates import SkyCoord, Longitude, Latitude
-from astropy.wcs import WCS
 from .core import Telescope
-import ouscope.util as ousutil
 
-# %% ../15_solver.ipynb 4
+# %% ../15_solver.ipynb 6
+class WCSHints:
+    '''
+    Store of the prior solutions keyed by telescope and pointing.
+    '''
+    def __init__(self, fn='.cache/wcs/hints.sqlite', radius=0.5):
+        os.makedirs(os.path.dirname(fn) or '.', exist_ok=True)
+        self.radius = radius
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fn, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS hints (
+                              tel TEXT, 
+                              ra REAL, 
+                              dec REAL, 
+                              wcs TEXT, 
+                              stars BLOB,
+                              PRIMARY KEY (tel, ra, dec))''')
+
+    def __len__(self):
+        with self.lock :
+            return self.db.execute('SELECT COUNT(*) FROM hints').fetchone()[0]
+
+    def add(self, tel, ra, dec, wcs, stars):
+        '''
+        Store the solution `wcs` (FITS header) of the frame pointed at ra, dec 
+        (degrees) with the (n,2) array of the pixel positions of its brightest stars.
+        The older hint for the same pointing is replaced.
+        '''
+        import numpy as np
+
+        stars = np.ascontiguousarray(stars, dtype=np.float32)
+        with self.lock :
+            self.db.execute('INSERT OR REPLACE INTO hints VALUES (?,?,?,?,?)',
+                            (tel, round(ra, 2), round(dec, 2), 
+                             wcs.tostring(sep='\n'), stars.tobytes()))
+
+    def nearest(self, tel, ra, dec):
+        '''
+        The nearest prior solution for the telescope within `radius` degrees
+        as a dict with ra, dec, wcs (header) and stars. None if not found.
+        '''
+        import numpy as np
+        from astropy.io import fits
+
+        with self.lock :
+            rows = self.db.execute('''SELECT ra, dec, wcs, stars FROM hints 
+                                      WHERE tel=? AND dec BETWEEN ? AND ?''',
+                                   (tel, dec - self.radius, dec + self.radius)).fetchall()
+        if not rows :
+            return None
+        pos = np.radians([r[:2] for r in rows])
+        ra, dec = np.radians(ra), np.radians(dec)
+        d = 2*np.arcsin(np.sqrt(np.sin((pos[:,1]-dec)/2)**2 + 
+                                np.cos(dec)*np.cos(pos[:,1])*np.sin((pos[:,0]-ra)/2)**2))
+        n = np.argmin(d)
+        if np.degrees(d[n]) > self.radius :
+            return None
+        hra, hdec, wcs, stars = rows[n]
+        return dict(ra=hra, dec=hdec, wcs=fits.Header.fromstring(wcs, sep='\n'),
+                    stars=np.frombuffer(stars, dtype=np.float32).reshape(-1, 2))
+
+# %% ../15_solver.ipynb 7
+def refine_wcs(hint, stars, min_match=8, tol=1.0):
+    '''
+    Find the WCS of the frame with the (n,2) `stars` pixel positions
+    by matching them with the stars of the prior solution `hint`. 
+    Returns the header of the fitted WCS or None if the stars do not match
+    (less than `min_match` matched stars or rms residual above `tol` pixels).
+    '''
+    import numpy as np
+    import astroalign as aa
+    from astropy.wcs import WCS
+    from astropy.wcs.utils import fit_wcs_from_points
+
+    loger = logging.getLogger(__name__)
+    try :
+        _, (src, ref) = aa.find_transform(np.asarray(stars), hint['stars'])
+    except (aa.MaxIterError, ValueError, TypeError) as e :
+        loger.debug(f'No match with the hint: {e}')
+        return None
+    if len(src) < min_match :
+        return None
+    sky = WCS(hint['wcs']).pixel_to_world(ref[:,0], ref[:,1])
+    w = fit_wcs_from_points((src[:,0], src[:,1]), sky, projection='TAN')
+    x, y = w.world_to_pixel(sky)
+    rms = np.sqrt(np.mean((x - src[:,0])**2 + (y - src[:,1])**2))
+    if not rms < tol :
+        loger.debug(f'Hint match rejected, rms={rms:.2f}px')
+        return None
+    return w.to_header()
+
+# %% ../15_solver.ipynb 9
+def radec_to_healpix(ra, dec, nside):
+    '''
+    Number of the healpix of the astrometry.net (xy) scheme containing
+    the point(s) ra, dec (degrees).
+    '''
+    import numpy as np
+
+    ra, dec = np.radians(ra), np.radians(dec)
+    vz = np.sin(dec)
+    phi = np.mod(ra, 2*np.pi)
+    phi_t = np.mod(phi, np.pi/2)
+    offset = np.mod(np.round((phi - phi_t)/(np.pi/2)).astype(int), 4)
+    # Polar caps
+    north = vz >= 0
+    zf = np.where(north, 1.0, -1.0)
+    kx = np.sqrt(np.maximum(0, (1 - vz*zf)*3*(nside*(2*phi_t - np.pi)/np.pi)**2))
+    ky = np.sqrt(np.maximum(0, (1 - vz*zf)*3*(nside*2*phi_t/np.pi)**2))
+    px = np.where(north, nside - kx, ky)
+    py = np.where(north, nside - ky, kx)
+    pbase = np.where(north, offset, 8 + offset)
+    # Equatorial belt
+    zu = (vz + 2/3)/(4/3)
+    pu = phi_t/(np.pi/2)
+    ex = (zu + pu)*nside
+    ey = (zu - pu + 1)*nside
+    right, top = ex >= nside, ey >= nside
+    ebase = np.select([right & top, right, top], 
+                      [offset, (offset + 1) % 4 + 4, offset + 4], 8 + offset)
+    ex = np.where(right, ex - nside, ex)
+    ey = np.where(top, ey - nside, ey)
+    polar = np.abs(vz) >= 2/3
+    base = np.where(polar, pbase, ebase)
+    x = np.clip(np.floor(np.where(polar, px, ex)), 0, nside-1).astype(int)
+    y = np.clip(np.floor(np.where(polar, py, ey)), 0, nside-1).astype(int)
+    return (base*nside + x)*nside + y
+
+# %% ../15_solver.ipynb 11
+class IndexSet:
+    '''
+    Sky coverage and scale range of the local astrometry.net index files.
+    '''
+    dirs = ('/usr/share/astrometry', '/usr/local/astrometry/data', 
+            '/usr/local/share/astrometry')
+    
+    def __init__(self, dirs=None):
+        import numpy as np
+        from astropy.io import fits
+
+        self.paths = []
+        hpx, nside, lo, hi = [], [], [], []
+        for d in (IndexSet.dirs if dirs is None else dirs):
+            for fn in sorted(glob.glob(os.path.join(d, '*.fits'))):
+                head = fits.getheader(fn)
+                if 'SCALE_U' not in head :
+                    continue
+                self.paths.append(fn)
+                hpx.append(head.get('HEALPIX', -1))
+                nside.append(head.get('HPNSIDE', 1))
+                # Quad scales in arcmin
+                lo.append(np.degrees(head['SCALE_L'])*60)
+                hi.append(np.degrees(head['SCALE_U'])*60)
+        self.healpix, self.nside = np.array(hpx, dtype=int), np.array(nside, dtype=int)
+        self.scale_l, self.scale_u = np.array(lo), np.array(hi)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def select(self, ra, dec, radius, qlo, qhi):
+        '''
+        Index files covering the circle of `radius` degrees around ra, dec
+        with the quads of the size in the range qlo...qhi arcmin.
+        '''
+        import numpy as np
+
+        # Sample the search circle: center and two rings
+        r = np.radians(np.r_[0, np.repeat([radius/2, radius], 16)])
+        a = np.r_[0, np.tile(np.linspace(0, 2*np.pi, 16, endpoint=False), 2)]
+        d0 = np.radians(dec)
+        sdec = np.arcsin(np.sin(d0)*np.cos(r) + np.cos(d0)*np.sin(r)*np.cos(a))
+        sra = ra + np.degrees(np.arctan2(np.sin(a)*np.sin(r)*np.cos(d0),
+                                         np.cos(r) - np.sin(d0)*np.sin(sdec)))
+        sdec = np.degrees(sdec)
+        use = (self.scale_u >= qlo) & (self.scale_l <= qhi)
+        for ns in np.unique(self.nside):
+            sel = self.nside == ns
+            hps = np.unique(radec_to_healpix(sra, sdec, ns))
+            use &= ~sel | (self.healpix < 0) | np.isin(self.healpix, hps)
+        return [p for p, u in zip(self.paths, use) if u]
+
+    def config(self, fn, ra, dec, radius, qlo, qhi):
+        '''
+        Write the backend config with the indexes selected for the field.
+        Returns the number of the selected index files.
+        '''
+        sel = self.select(ra, dec, radius, qlo, qhi)
+        with open(fn, 'w') as f:
+            f.write('inparallel\n')
+            for p in sel :
+                f.write(f'index {p}\n')
+        return len(sel)
+
+# %% ../15_solver.ipynb 12
 class Solver:
     '''
     Wrapper of AstrometryNet solver from astropy tuned for the use in osob use.
@@ -41,7 +234,15 @@ class Solver:
     }
 
     
-    def __init__(self, api_key=None, cache='.cache/wcs', cmd=None, args=None):
+    _xyargs = ' --width %d --height %d --x-column X --y-column Y --sort-column FLUX'
+    # Scale range and search radius options set from the hint
+    _hintopts = ('-L', '-H', '-5')
+    _hint_radius = 0.2
+    _radius = 2
+    _cfgargs = ' --backend-config %s'
+
+    def __init__(self, api_key=None, cache='.cache/wcs', cmd=None, args=None, 
+                 xylist=False, nstars=200, hints=True, indexes=None):
         if cmd is None:
             self._cmd = Solver._cmd
         else:
@@ -59,43 +260,128 @@ class Solver:
             self.ast.api_key = api_key
         self._cache = cache
         self._tout = 15
+        self.xylist = xylist
+        self.nstars = nstars
+        if hints is True :
+            hints = os.path.join(cache, 'hints.sqlite')
+        self.hints = WCSHints(hints) if hints else None
+        self.indexes = indexes
+
+# %% ../15_solver.ipynb 14
+KEY_CARDS = ('DATE-OBS', 'TELESCOP', 'INSTRUME', 'FILTER', 'EXPTIME', 
+             'OBJCTRA', 'OBJCTDEC', 'MNTRA', 'MNTDEC', 'BITPIX', 'BZERO', 'BSCALE')
 
-# %% ../15_solver.ipynb 5
+def frame_key(hdu):
+    '''
+    Key of the frame: hash of the identifying header cards,
+    the shape and type of the data and the sums of the rows
+    and columns of the raw image buffer.
+    '''
+    import numpy as np
+
+    h = hashlib.blake2b(digest_size=16)
+    for card in KEY_CARDS:
+        v = hdu.header.get(card)
+        if card == 'TELESCOP' and v in ("'undefined'", 'unknown'):
+            # Set by `Solver._frame_telescope` for the frames without the card
+            v = None
+        h.update(f'{card}={v!r};'.encode())
+    data = hdu.data
+    if data is not None and data.size:
+        h.update(f'{data.shape}{data.dtype.str}'.encode())
+        # Rows of the raw bytes summed as the widest words which fit them
+        raw = np.ascontiguousarray(data).reshape(-1, data.shape[-1]).view(np.uint8)
+        word = next(w for w in (8, 4, 2, 1) if raw.shape[1] % w == 0)
+        raw = raw.view(f'u{word}')
+        h.update(raw.sum(axis=1, dtype=np.uint64))
+        h.update(raw.sum(axis=0, dtype=np.uint64))
+    return h.hexdigest()
+
+# %% ../15_solver.ipynb 15
 @patch
-def solve(self: Solver, hdu, crop=(slice(0,-32), slice(0,-32)), force_solve=False, tout=None):
+def _cache_path(self: Solver, key):
+    fn = f'{key}.wcs'
+    return os.path.join(self._cache,fn[0],fn[1],fn)
+
+@patch
+def _legacy_lookup(self: Solver, hdu, fp):
+    '''
+    Find the solution stored under the DATASUM of the frame by the older
+    versions and copy it to fp. The header of the frame is not modified.
+    The DATASUM card of the header is used when present. Otherwise it is
+    computed with the astropy internal `_calculate_datasum` - the method
+    used by `add_datasum` - without adding the card to the header.
+    '''
+    datasum = str(hdu.header.get('DATASUM', '')).strip()
+    if datasum:
+        datasum = int(datasum)
+    else :
+        datasum = hdu._calculate_datasum()
+    old = self._cache_path(f'{int(datasum):08X}')
+    if not os.path.isfile(old):
+        return False
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    shutil.copyfile(old, fp)
+    return True
+
+# %% ../15_solver.ipynb 16
+@patch
+def solve(self: Solver, hdu, crop=(slice(0,-32), slice(0,-32)), force_solve=False, tout=None, 
+          timeout=None, started=None):
     '''
     Solve plate in fits format using local (if present) or 
-    remote (not fully implemented yet) AstrometryNet solver
+    remote (not fully implemented yet) AstrometryNet solver.
+    The frame is first matched against the nearest prior solution from
+    the `hints` store. The `timeout` and `started` arguments are passed 
+    to `_solveField_local`.
     '''
+    from astropy.io import fits
+
     loger = logging.getLogger(__name__)
-    if hdu.verify_datasum()!=1:
-        hdu.add_datasum()
-    fn = f'{int(hdu.header["DATASUM"]):08X}.wcs'
-    fp = os.path.join(self._cache,fn[0],fn[1],fn)
-    if force_solve or not os.path.isfile(fp) :
-        loger.info(f'Solving for {fn[:-4]}')
-        print(f'Solving for {fn[:-4]}')
-        s = self._solveField_local(hdu, tout=tout)
-        if s:
-            wcs_header = fits.Header(s.header)
-            #wcs_header['NAXIS'] = 2
-            #wcs_header['NAXIS1'] = wcs_header['IMAGEW']
-            #wcs_header['NAXIS2'] = wcs_header['IMAGEH']
+    fn = frame_key(hdu)
+    fp = self._cache_path(fn)
+    if force_solve or not (os.path.isfile(fp) or self._legacy_lookup(hdu, fp)) :
+        loger.info(f'Solving for {fn}')
+        print(f'Solving for {fn}')
+        hint = stars = wcs_header = None
+        if self.hints is not None :
+            import numpy as np
+            tel = self._frame_telescope(hdu)
+            o = self._getFrameRaDec(hdu)
+            hint = self.hints.nearest(tel, o.ra.deg, o.dec.deg)
+            x, y, _ = find_sources(hdu.data[crop], self.nstars)
+            stars = np.c_[x, y]
+            if hint is not None :
+                wcs_header = refine_wcs(hint, stars)
+                if wcs_header is not None :
+                    loger.info(f'Solved {fn} from the hint')
+        if wcs_header is None :
+            s = self._solveField_local(hdu, tout=tout, timeout=timeout, started=started,
+                                       crop=crop, hint=hint)
+            if s:
+                wcs_header = fits.Header(s.header)
+                #wcs_header['NAXIS'] = 2
+                #wcs_header['NAXIS1'] = wcs_header['IMAGEW']
+                #wcs_header['NAXIS2'] = wcs_header['IMAGEH']
+                if stars is not None and len(stars) >= 3 :
+                    self.hints.add(tel, o.ra.deg, o.dec.deg, wcs_header, stars)
+        if wcs_header is not None :
             os.makedirs(os.path.dirname(fp), exist_ok=True)
             with open(fp, 'w') as fh:
                 wcs_header.totextfile(fp)
-        else:
-            wcs_header = None
     else :
-        loger.info(f'Getting {fn[:-4]} from cache')
-        print(f'Getting {fn[:-4]} from cache')
+        loger.info(f'Getting {fn} from cache')
+        print(f'Getting {fn} from cache')
         with open(fp, 'r') as fh:
             wcs_header = fits.Header.fromtextfile(fh)        
     return wcs_header
 
-# %% ../15_solver.ipynb 6
+# %% ../15_solver.ipynb 19
 @patch
 def _getFrameRaDec(self: Solver, hdu):
+    from astropy.time import Time
+    from astropy.coordinates import SkyCoord, Longitude, Latitude
+
     if 'OBJCTRA' in hdu.header:
         ra=hdu.header['OBJCTRA']
         dec=hdu.header['OBJCTDEC']
@@ -120,22 +406,65 @@ def _getFrameRaDec(self: Solver, hdu):
     return o
 
 
-# %% ../15_solver.ipynb 7
-@patch
-def _solveField_local(self: Solver, hdu, tout=None, cleanup=True):
+# %% ../15_solver.ipynb 20
+def kill_solver(proc):
     '''
-    Run local solver for hdu.
+    Kill the whole process group of the solver process
+    (solve-field runs its helpers in subprocesses).
     '''
-    loger = logging.getLogger(__name__)
-    o=self._getFrameRaDec(hdu)
-    ra=o.ra.deg
-    dec=o.dec.deg
+    try :
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError :
+        pass
 
+# %% ../15_solver.ipynb 22
+def find_sources(data, nstars=200, fwhm=3.5, threshold=5.0, step=4):
+    '''
+    Detect the `nstars` brightest sources in the image. The background
+    statistics are computed on every `step`-th pixel of the image.
+    Returns the arrays of x, y (0-based) and flux sorted by flux.
+    '''
+    import numpy as np
+    from astropy.stats import sigma_clipped_stats
+    from photutils.detection import DAOStarFinder
+
+    data = np.asarray(data, dtype=np.float32)
+    _, med, std = sigma_clipped_stats(data[::step, ::step], sigma=3.0)
+    src = DAOStarFinder(threshold=threshold*std, fwhm=fwhm)(data - med)
+    if src is None :
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    x, y = [np.asarray(src[c] if c in src.colnames else src[c.replace('_', '')])
+            for c in ('x_centroid', 'y_centroid')]
+    flux = np.asarray(src['flux'])
+    idx = np.argsort(flux)[::-1][:nstars]
+    return x[idx], y[idx], flux[idx]
+
+# %% ../15_solver.ipynb 23
+def write_xylist(hdu, fn, nstars=200, crop=None):
+    '''
+    Write the list of the `nstars` brightest sources of the hdu 
+    to the FITS table in the file fn. The coordinates are 1-based.
+    '''
+    from astropy.io import fits
+
+    data = hdu.data if crop is None else hdu.data[crop]
+    x, y, flux = find_sources(data, nstars)
+    fits.BinTableHDU.from_columns([
+        fits.Column(name='X', format='E', array=x + 1),
+        fits.Column(name='Y', format='E', array=y + 1),
+        fits.Column(name='FLUX', format='E', array=flux),
+    ]).writeto(fn, overwrite=True)
+
+# %% ../15_solver.ipynb 24
+@patch
+def _frame_telescope(self: Solver, hdu):
+    '''
+    Name of the telescope of the frame (key of `Solver._telescopes`).
+    '''
     try :
         tel = hdu.header['TELESCOP'].lower()
     except KeyError:
         tel = 'unknown'
-        hdu.header.remove('TELESCOP')
         hdu.header['TELESCOP'] = tel
 
     if hdu.header['TELESCOP']=="'undefined'":
@@ -147,22 +476,106 @@ def _solveField_local(self: Solver, hdu, tout=None, cleanup=True):
         tel=tel.split()[1]
     else :
         tel=tel.split()[0]
+    return tel
+
+# %% ../15_solver.ipynb 26
+def _set_option(args, opt, value):
+    '''
+    Set the value of the `opt` option in the argument list. 
+    The option is appended if it is not in the list.
+    '''
+    args = list(args)
+    for n, a in enumerate(args[:-1]):
+        if a == opt:
+            args[n+1] = value
+            return args
+    return args + [opt, value]
+
+# %% ../15_solver.ipynb 27
+@patch
+def _solveField_local(self: Solver, hdu, tout=None, cleanup=True, timeout=None, started=None,
+                      crop=None, hint=None):
+    '''
+    Run local solver for hdu. The solver runs in its own process group
+    which is killed after `timeout` seconds of wall-clock time.
+    The `started` function is called with the solver process 
+    right after its start. In the `xylist` mode the sources are
+    detected in the `crop` region of the frame and the solver gets 
+    only the list of the `nstars` brightest of them. With the prior
+    solution `hint` the search is limited to the small region around 
+    the predicted position and to the scale of the prior solution.
+    With the `indexes` set only the index files relevant for the field
+    are loaded by the solver.
+    '''
+    from astropy.io import fits
+
+    loger = logging.getLogger(__name__)
+    o=self._getFrameRaDec(hdu)
+    ra=o.ra.deg
+    dec=o.dec.deg
+
+    tel = self._frame_telescope(hdu)
 
     loapp, hiapp=Solver._telescopes[tel]
+    radius = None
+    scale = None
+    if hint is not None :
+        # Pointing offset and pixel scale of the prior solution
+        from astropy.wcs import WCS
+        from astropy.wcs.utils import proj_plane_pixel_scales
+        w = WCS(hint['wcs'])
+        c = w.pixel_to_world(*((n-1)/2 for n in hdu.shape[::-1]))
+        # Offsets across the RA=0 meridian
+        ra = (ra + ((c.ra.deg - hint['ra'] + 180) % 360 - 180)) % 360
+        dec += c.dec.deg - hint['dec']
+        scale = proj_plane_pixel_scales(w).mean()*3600
+        radius = self._hint_radius
     td=tempfile.mkdtemp(prefix='field-solver')
     try :
         fn=tempfile.mkstemp(dir=td, suffix='.fits')
-        loger.debug(td, fn)
+        loger.debug('%s %s', td, fn[1])
         #print(fn[1], hdu.header['TELESCOP'])
-        hdu.writeto(fn[1])
         cmd = self._cmd % (self._tout if tout is None else tout,
                            loapp, hiapp, ra, dec, fn[1])
+        if self.indexes is not None :
+            # Quads from 10% of the smaller to the full larger size of the frame
+            lo, hi = (loapp, hiapp) if scale is None else (0.95*scale, 1.05*scale)
+            sz = min(hdu.shape[-2:]), max(hdu.shape[-2:])
+            r = (self._radius if radius is None else radius) + sz[1]*hi/3600
+            cfg = os.path.join(td, 'backend.cfg')
+            if self.indexes.config(cfg, ra, dec, r, 0.1*sz[0]*lo/60, sz[1]*hi/60) :
+                cmd += self._cfgargs % cfg
+            else :
+                loger.warning('No index covers the field - using default config')
+        if self.xylist :
+            write_xylist(hdu, fn[1], self.nstars, crop)
+            cmd += self._xyargs % hdu.shape[::-1]
+            out_fn = fn[1][:-5]+'.wcs'
+        else :
+            hdu.writeto(fn[1])
+            out_fn = fn[1][:-5]+'.new'
+        args = shlex.split(cmd)
+        if radius is not None :
+            # Replace the default scale range and radius of the command
+            for opt, v in zip(self._hintopts, (0.95*scale, 1.05*scale, radius)):
+                args = _set_option(args, opt, f'{v:f}')
+        cmd = shlex.join(args)
         loger.debug(cmd)
         print(cmd)
-        solver=os.popen(cmd)
-        for ln in solver:
+        solver=subprocess.Popen(args, stdout=subprocess.PIPE, 
+                                stderr=subprocess.STDOUT, text=True,
+                                start_new_session=True)
+        if started :
+            started(solver)
+        try :
+            out, _ = solver.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired :
+            loger.warning(f'Solver killed after {timeout}s')
+            kill_solver(solver)
+            out, _ = solver.communicate()
+        for ln in out.splitlines():
             loger.debug(ln.strip())
-        shdu=fits.open(BytesIO(open(fn[1][:-5]+'.new','rb').read()))
+        shdu=fits.open(BytesIO(open(out_fn,'rb').read()))
         return shdu[0]
     except IOError :
         return None
@@ -170,3 +583,118 @@ def _solveField_local(self: Solver, hdu, tout=None, cleanup=True):
         if cleanup :
             shutil.rmtree(td)
 
+
+# %% ../15_solver.ipynb 30
+class SolverPool:
+    '''
+    Pool of local solvers running in parallel. 
+    The results of `submit` and `solve_first` are futures.
+    '''
+    def __init__(self, solver=None, workers=None, timeout=120):
+        self.solver = Solver() if solver is None else solver
+        if workers is None :
+            workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        self.workers = workers
+        self.timeout = timeout
+        self.ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='solver')
+        self.lock = threading.Lock()
+        self.procs = {}
+        self.cancelled = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown(cancel=True)
+
+    def _run(self, fut, hdu, kwargs):
+        if not fut.set_running_or_notify_cancel() :
+            return
+        def started(proc):
+            with self.lock :
+                self.procs[id(fut)] = proc
+                if id(fut) in self.cancelled :
+                    kill_solver(proc)
+        try :
+            res = self.solver.solve(hdu, started=started, **kwargs)
+        except Exception as e :
+            res = e
+        with self.lock :
+            self.procs.pop(id(fut), None)
+            cancelled = id(fut) in self.cancelled
+            self.cancelled.discard(id(fut))
+        if cancelled :
+            fut.set_exception(CancelledError())
+        elif isinstance(res, Exception) :
+            fut.set_exception(res)
+        else :
+            fut.set_result(res)
+
+    def submit(self, hdu, tout=None, timeout=None, force_solve=False) -> Future:
+        '''
+        Schedule solving of the hdu. The future is resolved with 
+        the WCS header or None if the frame cannot be solved.
+        '''
+        fut = Future()
+        kwargs = dict(tout=tout, force_solve=force_solve,
+                      timeout=self.timeout if timeout is None else timeout)
+        self.ex.submit(self._run, fut, hdu, kwargs)
+        return fut
+
+    def cancel(self, fut):
+        '''
+        Cancel the task. The running solver is killed.
+        '''
+        if fut.cancel() or fut.done() :
+            return
+        with self.lock :
+            self.cancelled.add(id(fut))
+            proc = self.procs.get(id(fut))
+        if proc is not None :
+            kill_solver(proc)
+
+    def solve_first(self, hdus, **kwargs) -> Future:
+        '''
+        Solve the frames in parallel. The future is resolved with the
+        (index, header) of the first solved frame or None if none of 
+        them was solved. The remaining tasks are cancelled.
+        '''
+        res = Future()
+        res.set_running_or_notify_cancel()
+        futs = [self.submit(hdu, **kwargs) for hdu in hdus]
+        left = [len(futs)]
+        lock = threading.Lock()
+        def done(n, f):
+            try :
+                wcs = f.result()
+            except (CancelledError, Exception) :
+                wcs = None
+            with lock :
+                left[0] -= 1
+                if res.done() :
+                    return
+                if wcs is not None :
+                    res.set_result((n, wcs))
+                elif left[0] == 0 :
+                    res.set_result(None)
+                else :
+                    return
+            for g in futs :
+                self.cancel(g)
+        if not futs :
+            res.set_result(None)
+        for n, f in enumerate(futs) :
+            f.add_done_callback(lambda f, n=n: done(n, f))
+        return res
+
+    def shutdown(self, cancel=False):
+        '''
+        Shut down the pool. Kill the running solvers if `cancel` is True.
+        '''
+        if cancel :
+            with self.lock :
+                procs = list(self.procs.items())
+                self.cancelled |= {k for k, _ in procs}
+            for _, proc in procs :
+                kill_solver(proc)
+        self.ex.shutdown(wait=True, cancel_futures=cancel)
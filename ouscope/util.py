@@ -12,7 +12,7 @@ __all__ = []
 import os
 from fastcore.basics import patch
 from ouscope.core import Telescope
-from tqdm.auto import tqdm
+from ouscope.catalog import Catalog
 
 # %% ../20_util.ipynb 5
 def print_dict(d):
@@ -21,16 +21,12 @@ def print_dict(d):
 
 # %% ../20_util.ipynb 7
 @patch
-def get_object_obs(self: Telescope, obj: str):
+def get_object_obs(self: Telescope, obj: str, catalog: Catalog=None):
     '''
-    Find all jobs for a given object.
+    Find all jobs for a given object. Returns (jid, rid) pairs
+    from the local catalog updated with `sync_catalog`.
     '''
-    reqlst=self.get_user_requests(sort='completion')
-    print(f'Number of users requests: {len(reqlst)}')
-
-    complete = [rq for rq in sorted(reqlst, key=lambda r: int(r['requesttime']), reverse=True) 
-                        if Telescope.REQUESTSTATUS_TEXTS[int(rq['status'])]=='Complete']
-    print('Completed:', len(complete))
-    objjobs = ((int(self.get_request(int(j['id']))['jid']), int(j['id'])) 
-               for j in complete if j['objectname']==obj)
-    return objjobs
+    catalog = self.sync_catalog(catalog)
+    objjobs = catalog.object_jobs(obj)
+    print(f'Completed requests of {obj}: {len(objjobs)}')
+    return iter(objjobs)
@@ -1,22 +1,140 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../25_vs.ipynb.
 
 # %% auto 0
-__all__ = ['get_VS_sequence']
+__all__ = ['cache_dir', 'SequenceService', 'sequence_service', 'parse_sequence', 'get_VS_sequence']
 
 # %% ../25_vs.ipynb 2
 from fastcore.basics import patch
 
 # %% ../25_vs.ipynb 3
 import sys
-import mechanicalsoup
+import os
+import time
+import configparser
+from os.path import expanduser
 from lxml import etree
 from math import sqrt
 from .core import Telescope
-from astropy.coordinates import SkyCoord
 import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 # %% ../25_vs.ipynb 4
-mech = mechanicalsoup.StatefulBrowser(soup_config={'features': 'lxml'})
+def cache_dir(config, name):
+    '''
+    Directory of the `name` cache: the `name` entry of the `[cache]` section
+    of the config file, or the `name` directory next to the jobs cache.
+    '''
+    conf = configparser.ConfigParser()
+    conf.read(expanduser(config))
+    if not conf.has_section('cache'):
+        return os.path.join('.cache', name)
+    jobs = conf['cache'].get('jobs', os.path.join('.cache', 'jobs'))
+    return expanduser(conf['cache'].get(name, os.path.join(os.path.dirname(jobs), name)))
+
+class SequenceService:
+    '''
+    Fetcher of the AAVSO comparison sequences with the persistent cache.
+    The sequences are kept for `ttl` seconds, stars without the sequence
+    for `miss_ttl` seconds. Every worker thread uses its own http session.
+    The cache `directory` defaults to the `vsp` entry of the `[cache]` 
+    section of the `config` file (see `cache_dir`).
+    '''
+    url = 'https://www.aavso.org/apps/vsp/photometry/'
+    # Pause before the second attempt of the failed query (s)
+    retry_delay = 5
+
+    def __init__(self, directory=None, ttl=7*86400, miss_ttl=86400, 
+                 workers=8, url=None, tout=30, config='~/.config/telescope.ini'):
+        self.db = diskcache.Cache(cache_dir(config, 'vsp') if directory is None else directory)
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.workers = workers
+        self.tout = tout
+        if url is not None:
+            self.url = url
+        self.local = threading.local()
+
+    def session(self):
+        '''
+        Http session of the current thread. Failed connections and server 
+        errors are retried with exponential backoff.
+        '''
+        s = getattr(self.local, 's', None)
+        if s is None:
+            s = requests.Session()
+            s.mount('https://', HTTPAdapter(max_retries=Retry(
+                total=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504))))
+            s.mount('http://', s.get_adapter('https://'))
+            self.local.s = s
+        return s
+
+    @staticmethod
+    def key(vs, fov, maglimit):
+        return ('vsp', ' '.join(vs.split()), float(fov), float(maglimit))
+
+    def fetch(self, vs, fov=60, maglimit=17):
+        '''
+        Download and parse the sequence (bypassing the cache).
+        '''
+        rsp = self.session().get(self.url, timeout=self.tout,
+                                 params={'fov': '%.1f' % fov, 'star': ' '.join(vs.split()),
+                                         'Rc': 'on', 'B': 'on', 'maglimit': '%.1f' % maglimit})
+        rsp.raise_for_status()
+        return parse_sequence(rsp.content)
+
+    def get(self, vs, fov=60, maglimit=17):
+        '''
+        The (sequence id, stars) of the vs. (None, None) if there is no sequence.
+        '''
+        key = self.key(vs, fov, maglimit)
+        res = self.db.get(key)
+        if res is None:
+            try :
+                res = self.fetch(vs, fov, maglimit)
+            except (requests.ConnectionError, ConnectionError) as e:
+                logging.getLogger(__name__).info(f'AAVSO query for {vs} failed ({e}). Retrying.')
+                time.sleep(self.retry_delay)
+                res = self.fetch(vs, fov, maglimit)
+            self.db.set(key, res, expire=self.ttl if res[0] else self.miss_ttl)
+        return res
+
+    def prefetch(self, stars, fov=60, maglimit=17):
+        '''
+        Get the sequences of many stars at once. Only the stars missing in
+        the cache are fetched - concurrently by `workers` threads.
+        Returns the dictionary: star -> (sequence id, stars).
+        '''
+        log = logging.getLogger(__name__)
+        res = {vs: self.db.get(self.key(vs, fov, maglimit)) for vs in stars}
+        missing = [vs for vs, r in res.items() if r is None]
+        def get(vs):
+            try :
+                return vs, self.get(vs, fov, maglimit)
+            except requests.RequestException as e:
+                log.warning(f'Cannot get AAVSO sequence for {vs}: {e}')
+                return vs, (None, None)
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as ex:
+                res.update(ex.map(get, missing))
+        return res
+
+_service = None
+
+def sequence_service(config='~/.config/telescope.ini'):
+    '''
+    Shared sequence service, created on first use
+    with the cache directory from the config file.
+    '''
+    global _service
+    if _service is None:
+        _service = SequenceService(config=config)
+    return _service
 
 # %% ../25_vs.ipynb 5
 def prtMag(m):
@@ -33,17 +151,13 @@ def prtMag(m):
 dsgn=['u', 'b', 'v', 'rc', 'ic']
 
 # %% ../25_vs.ipynb 6
-def get_VS_sequence(vs, fov=60, maglimit=17, DEBUG = False):
-    #fov*=sqrt(2)
-    url="http://www.aavso.org/cgi-bin/vsp.pl?name=%s&ccdtable=on&fov=%d" % ("%20".join(vs.split()),fov)
-    url="https://www.aavso.org/apps/vsp/photometry/?fov=%.1f&star=%s&Rc=on&B=on&maglimit=%.1f" % ( fov,
-            '+'.join(vs.split()), maglimit)
-    page = mech.open(url)
-    html = ''.join([str(ln) for ln in page.soup])
-    page.close()
-    parser=etree.HTMLParser()
-    #tree=etree.parse(open('rcp/sekw.html'),parser)
-    tree=etree.fromstring(html,parser)
+def parse_sequence(content, DEBUG = False):
+    '''
+    Parse the AAVSO VSP photometry page. Returns (sequence id, stars).
+    '''
+    tree=etree.HTML(content)
+    if tree is None :
+        return None, None
 
     try :
         var=' '.join(tree.xpath('//p//strong//text()')[0].split()[1:])
@@ -66,9 +180,9 @@ def get_VS_sequence(vs, fov=60, maglimit=17, DEBUG = False):
             auid=c[0]
             lbl=row.xpath('./td/strong/text()')[0]
             ra=c[1].split()[0]
-            ra_flt=float(c[1].split()[1][1:-2])
+            ra_flt=float(c[1].split()[1].strip('[]°'))
             dec=c[2].split()[0]
-            dec_flt=float(c[2].split()[1][1:-2])
+            dec_flt=float(c[2].split()[1].strip('[]°'))
             #print(c, file=sys.stderr)
             #print(auid, lbl, ra, ra_flt, dec, dec_flt, file=sys.stderr)
     #        for d,m in zip(dsgn, (c[4], c[5], c[6], c[8], c[9])):
@@ -84,9 +198,35 @@ def get_VS_sequence(vs, fov=60, maglimit=17, DEBUG = False):
     #print(' ', seq, fov, file=sys.stderr)
     return seq, stars
 
-# %% ../25_vs.ipynb 8
+def get_VS_sequence(vs, fov=60, maglimit=17, DEBUG = False):
+    '''
+    AAVSO comparison sequence for the vs: (sequence id, stars).
+    The results are cached by the `sequence_service`.
+    '''
+    seq, stars = sequence_service().get(vs, fov, maglimit)
+    if DEBUG and seq:
+        print('\nSequence %s for: %s' % (seq, vs), file=sys.stderr)
+    return seq, stars
+
+# %% ../25_vs.ipynb 9
 @patch
 def submitVarStar(self: Telescope, name, expos=90, filt='BVR',comm='', tele='COAST'):
+    from astropy.coordinates import SkyCoord
     o=SkyCoord.from_name(name)
     return self.submit_job_api(o, name=name, comment=comm,
                             exposure=expos*1000, filt=filt, tele=tele)
+
+# %% ../25_vs.ipynb 10
+@patch
+def submitVarStars(self: Telescope, stars, workers=4, dry_run=False):
+    '''
+    Submit a list of variable stars concurrently, skipping the ones 
+    already in the queue. Every star is a dictionary of `submitVarStar`
+    arguments (`name`, `expos`, `filt`, `comm`, `tele`).
+    Returns the `submit_batch` results keyed by star name.
+    '''
+    from astropy.coordinates import SkyCoord
+    targets = [{'name': vs['name'], 'exposure': vs.get('expos', 90)*1000, 
+                'filt': vs.get('filt', 'BVR'), 'comment': vs.get('comm', ''),
+                'tele': vs.get('tele', 'COAST')} for vs in stars]
+    return self.submit_batch(targets, workers=workers, resolve=SkyCoord.from_name, dry_run=dry_run)
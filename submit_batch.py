@@ -3,7 +3,7 @@
 
 import ouscope
 from ouscope.core import Telescope
-from ouscope.vs import submitVarStar
+from ouscope.vs import submitVarStar, submitVarStars
 from collections import namedtuple
 import configparser
 import os
@@ -64,8 +64,9 @@ obslst=[
 
 log.info('Getting observing queue ...')
 
-reqlst=scope.get_user_requests(sort='completion')
-q=[r for r in reqlst if int(r['status'])<8]
+for rq in scope.sync_user_requests():
+    log.debug('Changed request: %s', rq)
+q=[r for r in scope.open_requests() if int(r['status'])<8]
 qn=[r['objectname'] for r in q]
 missing = [vs for vs in obslst if vs.name not in qn]
 
@@ -76,15 +77,18 @@ for j in qn:
 if missing :
     if args.submit:
         qprint('Submitting missing jobs:')
+        res = scope.submitVarStars([vs._asdict() for vs in missing])
     else:
         qprint('Dry run. Add -s to the command line to do actual submissions.')
         
     for vs in missing:
         qprint(f'{vs.name.split()[0]:>8} {vs.name.split()[1]} exp:{vs.expos:3.1f}s   {vs.comm}', end='')
         if args.submit :
-            r, i = scope.submitVarStar(vs.name, expos=vs.expos, comm=vs.comm)
+            r, i = res[vs.name]
             if r :
                 qprint(f' => id: {i}', end='')
+            elif r is None :
+                qprint(f' Queued: {i}', end='')
             else :
                 qprint(f' Failure:{i}', end='')
         qprint()